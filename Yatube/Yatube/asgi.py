@@ -0,0 +1,22 @@
+"""
+ASGI config for Yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Read-only posts pages are served by the async views from posts.async_views
+unless YATUBE_ASYNC_VIEWS is set to something other than ``1``. In that
+mode the streaming export URLs (``*/export/``) are not routed: Django 4.0
+iterates streaming responses inside the event loop, where the ORM cannot
+be used, so exports must be proxied to the WSGI workers.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Yatube.settings')
+os.environ.setdefault('YATUBE_ASYNC_VIEWS', '1')
+
+application = get_asgi_application()
@@ -44,11 +44,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,14 +58,21 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# debug_toolbar замедляет каждый запрос, поэтому подключается только
+# явно: YATUBE_DEBUG_TOOLBAR=1.
+DEBUG_TOOLBAR = os.environ.get('YATUBE_DEBUG_TOOLBAR') == '1'
+
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'Yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.InstrumentedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -73,6 +82,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.page_cache.page_cache_timeout',
             ],
         },
     },
@@ -80,13 +90,59 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'Yatube.wsgi.application'
 
+ASGI_APPLICATION = 'Yatube.asgi.application'
+
+# Постоянные соединения: поток переиспользует соединение до CONN_MAX_AGE
+# секунд вместо нового подключения на каждый запрос.
+CONN_MAX_AGE = int(os.environ.get('YATUBE_CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
     }
 }
 
+# Реплики для чтения. Локально это копии db.sqlite3, которые обновляет
+# manage.py sync_replicas; в тестах они зеркалят основную базу.
+DATABASE_REPLICAS = [
+    f'replica{number}'
+    for number in range(1, int(os.environ.get('YATUBE_DB_REPLICAS', 0)) + 1)
+]
+
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Режим для SQLite под нагрузкой (core.sqlite): WAL, PRAGMA на каждом
+# соединении и запись через один поток-писатель с пачками.
+SQLITE_TUNING = os.environ.get('YATUBE_SQLITE_TUNING') == '1'
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+SQLITE_SERIALIZED_WRITES = SQLITE_TUNING
+
+SQLITE_WRITE_BATCH = 50
+
+# Сколько секунд после записи клиент читает из основной базы.
+REPLICA_STICKY_SECONDS = 10
+
+REPLICA_STICKY_COOKIE = 'primary_until'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -102,12 +158,73 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Общий для всех воркеров кэш в файле SQLite: версии страниц, сами
+# страницы и хранилище sorl-thumbnail видны каждому процессу машины.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
 
+# Тесты получают свой файл кэша во временном каталоге.
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+THUMBNAIL_KVSTORE = 'sorl.thumbnail.kvstores.cached_db_kvstore.KVStore'
+THUMBNAIL_CACHE = 'default'
+
+# Страницы лент сбрасываются сигналами (posts.cache.bump), поэтому
+# срок жизни можно держать большим.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Прогревать кэш страниц ленты задачей очереди после публикации поста.
+# Воркер запрашивает страницы у сервера по HTTP, поэтому в режиме
+# JOBS_EAGER прогрев не выполняется.
+PAGE_CACHE_WARM = False
+
+PAGE_CACHE_WARM_URL = os.environ.get(
+    'YATUBE_PAGE_CACHE_WARM_URL', 'http://127.0.0.1:8000/'
+)
+
+PAGE_CACHE_WARM_HOST = ALLOWED_HOSTS[0]
+
+PAGE_CACHE_WARM_TIMEOUT = 10
+
+# Без воркера (manage.py runworker) задачи выполняются сразу в запросе.
+# Только для разработки (YATUBE_JOBS_EAGER=1) и тестов (core.test_runner).
+JOBS_EAGER = os.environ.get('YATUBE_JOBS_EAGER') == '1'
+
+JOBS_RETRY_DELAY = 30
+
+JOBS_STALE_AFTER = 60 * 10
+
+# Задачи, которые ставятся в очередь раз в N секунд воркером
+# (manage.py runworker). Без постоянного воркера их запускает cron:
+# manage.py runworker --once.
+JOBS_PERIODIC = {
+    'posts.decay_scores': 15 * 60,
+}
+
+# Вкладка «Популярное»: вес публикации и комментария, полураспад счёта
+# в секундах и порог, ниже которого строка удаляется из PostScore.
+POPULAR_SIZE = 20
+
+POPULAR_POST_WEIGHT = 1.0
+
+POPULAR_COMMENT_WEIGHT = 1.0
+
+POPULAR_HALF_LIFE = 6 * 60 * 60
+
+POPULAR_MIN_SCORE = 0.05
+
+# posts.popular.rebuild учитывает события за столько периодов полураспада.
+POPULAR_REBUILD_WINDOW = 5
+
 LANGUAGE_CODE = 'ru'
 
 TIME_ZONE = 'Europe/Moscow'
@@ -122,12 +239,50 @@ STATIC_URL = '/static/'
 
 VIEW_COEFF = 10
 
+# Комментарии под постом: первая страница приходит со страницей поста,
+# следующие подгружаются фрагментами.
+COMMENTS_PER_PAGE = 20
+
+# Каталог групп: групп на странице и авторов в сводке группы.
+GROUPS_PER_PAGE = 50
+
+GROUP_TOP_AUTHORS = 3
+
+# Записей в лентах RSS и Atom.
+SYNDICATION_ITEMS = 20
+
+# Асинхронные страницы чтения (posts.async_views); asgi.py включает их
+# по умолчанию, под WSGI остаются синхронные представления. В этом режиме
+# адресов потоковой выгрузки нет, их обслуживают WSGI-воркеры.
+ASYNC_VIEWS = os.environ.get('YATUBE_ASYNC_VIEWS') == '1'
+
+# Авторы с большим числом подписчиков не раскладываются по лентам при
+# публикации: их посты подмешиваются в ленту подписок при чтении.
+FEED_FANOUT_THRESHOLD = 1000
+
+FEED_BATCH_SIZE = 500
+
+# posts.search.DatabaseSearchBackend — для СУБД без FTS5.
+POSTS_SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Размеры, которые нарезаются из картинки поста при сохранении формы;
+# для каждого дополнительно сохраняется WebP-версия.
+POST_IMAGE_RENDITIONS = {
+    'card': (960, 339),
+    'card_small': (480, 170),
+}
+
+POST_IMAGE_QUALITY = 85
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ] 
+
+# Адреса, которым доступен /metrics; пустой список — без ограничений.
+METRICS_ALLOWED_IPS = INTERNAL_IPS
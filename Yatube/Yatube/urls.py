@@ -3,20 +3,26 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics_view
+
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('admin/', admin.site.urls),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
+
+if settings.DEBUG_TOOLBAR:
     import debug_toolbar
-    urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),) 
+    urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
 
 
 
@@ -0,0 +1,77 @@
+import json
+
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+from Yatube.settings import COMMENTS_PER_PAGE, VIEW_COEFF
+
+from core.management.commands import bench
+
+# Страница сайта и запрос API, который отдаёт клиенту те же данные.
+PAIRS = (
+    ('posts:index', {}, 'api:post_list', {}, f'limit={VIEW_COEFF}'),
+    ('posts:group_list', {'slug'}, 'api:post_list', {},
+     f'group={{slug}}&limit={VIEW_COEFF}'),
+    ('posts:profile', {'username'}, 'api:post_list', {},
+     f'author={{username}}&limit={VIEW_COEFF}'),
+    ('posts:post_detail', {'post_id'}, 'api:comment_list', {'post_id'},
+     f'limit={COMMENTS_PER_PAGE}'),
+)
+
+
+class Command(bench.Command):
+    help = (
+        'Сравнивает размер и задержку страниц сайта и запросов API '
+        'с теми же данными'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--fields',
+            help='?fields= для запросов API, например id,text,author',
+        )
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        options['server'] = None
+        user, values = bench.samples()
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0],
+                        REMOTE_ADDR=bench.REMOTE_ADDR)
+        client.force_login(user)
+        reports = []
+        for html_name, html_args, api_name, api_args, query in PAIRS:
+            html_url = reverse(html_name, kwargs={
+                name: values[name] for name in html_args} or None)
+            api_url = reverse(api_name, kwargs={
+                name: values[name] for name in api_args} or None)
+            query = query.format(**values)
+            if options['fields']:
+                query += f"&fields={options['fields']}"
+            api_url = f'{api_url}?{query}'
+            html = self.measure(
+                self.client_fetch(client, html_url, user), options)
+            api = self.measure(
+                self.client_fetch(client, api_url, user), options)
+            reports.append({'html_url': html_url, 'api_url': api_url,
+                            'html': html, 'api': api})
+        if options['json']:
+            self.stdout.write(json.dumps(reports, ensure_ascii=False))
+            return
+        for report in reports:
+            html, api = report['html'], report['api']
+            self.stdout.write(
+                f"{report['html_url']:<28} {html['bytes']:>7} байт "
+                f"p50 {html['p50_ms']:>7} мс  запросов {html['queries']:>3}"
+            )
+            self.stdout.write(
+                f"  {report['api_url']:<26} {api['bytes']:>7} байт "
+                f"p50 {api['p50_ms']:>7} мс  запросов {api['queries']:>3}  "
+                f"({api['bytes'] / html['bytes']:.0%} размера)"
+            )
@@ -0,0 +1,180 @@
+"""Ресурсы API: поля, колонки для .only() и сборка словарей.
+
+Каждое поле знает, какие колонки ему нужны и какие связи надо забрать
+через select_related, поэтому ?fields= сужает и SQL, и ответ, а
+вложенные автор и группа приходят тем же запросом. Поля, которых нет в
+строке модели, и пакеты постов по id берут данные из posts.loaders —
+по одному IN-запросу на вид данных.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from posts.loaders import GROUP_FIELDS, USER_FIELDS
+
+
+def dumps(data):
+    """Компактный JSON; даты — как у JsonResponse (DjangoJSONEncoder)."""
+    return json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode()
+
+
+def user_data(user):
+    return {
+        'id': user.pk,
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+    }
+
+
+def group_data(group):
+    if group is None:
+        return None
+    return {'id': group.pk, 'slug': group.slug, 'title': group.title}
+
+
+class Field:
+    def __init__(self, getter, columns=()):
+        self.getter = getter
+        self.columns = columns
+        self.related = None
+
+    def batch_columns(self):
+        return self.columns
+
+    def prepare(self, objects, loader, batched):
+        pass
+
+    def value(self, obj, loader, batched):
+        return self.getter(obj)
+
+
+class Embedded(Field):
+    """Связанный объект: JOIN в списках или загрузчик в пакетах по id."""
+
+    def __init__(self, name, columns, convert, loader):
+        super().__init__(convert, tuple(f'{name}__{column}'
+                                        for column in columns))
+        self.name = name
+        self.related = name
+        self.loader = loader
+
+    def batch_columns(self):
+        return (self.name,)
+
+    def prepare(self, objects, loader, batched):
+        if batched:
+            getattr(loader, self.loader).want(
+                getattr(obj, f'{self.name}_id') for obj in objects)
+
+    def value(self, obj, loader, batched):
+        if batched:
+            return self.getter(getattr(loader, self.loader).get(
+                getattr(obj, f'{self.name}_id')))
+        return self.getter(getattr(obj, self.name))
+
+
+class Loaded(Field):
+    """Значение из загрузчика: один IN-запрос на всю страницу."""
+
+    def __init__(self, loader, key, column, default=None):
+        super().__init__(None, (column,))
+        self.loader = loader
+        self.key = key
+        self.default = default
+
+    def prepare(self, objects, loader, batched):
+        getattr(loader, self.loader).want(
+            getattr(obj, self.key) for obj in objects)
+
+    def value(self, obj, loader, batched):
+        return getattr(loader, self.loader).get(
+            getattr(obj, self.key), self.default)
+
+
+class Resource:
+    def __init__(self, fields, ordering=(), extra=()):
+        self.fields = fields
+        self.ordering = tuple(ordering)
+        # Поля, которые отдаются только по явному ?fields=.
+        self.default = [name for name in fields if name not in extra]
+
+    def parse_fields(self, value):
+        """Имена полей из ?fields=; ValueError для неизвестных."""
+        if not value:
+            return list(self.default)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(', '.join(unknown))
+        return names
+
+    def columns(self, names, batched=False):
+        # Поля сортировки нужны курсору, иначе каждый объект догрузит их.
+        columns = [name.lstrip('-') for name in self.ordering]
+        for name in names:
+            field = self.fields[name]
+            columns.extend(
+                field.batch_columns() if batched else field.columns)
+        return columns
+
+    def apply(self, queryset, names):
+        """queryset, который читает только колонки выбранных полей."""
+        related = [self.fields[name].related for name in names
+                   if self.fields[name].related]
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*self.columns(names))
+
+    def dump(self, objects, names, loader=None, batched=False):
+        """Словари объектов; batched — связанные объекты из загрузчика."""
+        fields = [(name, self.fields[name]) for name in names]
+        for _, field in fields:
+            field.prepare(objects, loader, batched)
+        return [
+            {name: field.value(obj, loader, batched)
+             for name, field in fields}
+            for obj in objects
+        ]
+
+
+POST = Resource({
+    'id': Field(lambda post: post.pk),
+    'text': Field(lambda post: post.text, ('text',)),
+    'pub_date': Field(lambda post: post.pub_date, ('pub_date',)),
+    'updated_at': Field(lambda post: post.updated_at, ('updated_at',)),
+    'image': Field(
+        lambda post: post.image.url if post.image else None, ('image',)),
+    'comments_count': Field(
+        lambda post: post.comments_count, ('comments_count',)),
+    'author': Embedded('author', USER_FIELDS, user_data, 'users'),
+    'group': Embedded('group', GROUP_FIELDS, group_data, 'groups'),
+    'author_posts_count': Loaded(
+        'posts_counts', 'author_id', 'author', default=0),
+    'following': Loaded('following', 'author_id', 'author', default=False),
+}, ordering=('-pub_date', '-id'), extra=('author_posts_count', 'following'))
+
+COMMENT = Resource({
+    'id': Field(lambda comment: comment.pk),
+    'post': Field(lambda comment: comment.post_id, ('post',)),
+    'text': Field(lambda comment: comment.text, ('text',)),
+    'created': Field(lambda comment: comment.created, ('created',)),
+    'author': Embedded('author', USER_FIELDS, user_data, 'users'),
+}, ordering=('created', 'id'))
+
+GROUP = Resource({
+    'id': Field(lambda group: group.pk),
+    'slug': Field(lambda group: group.slug, ('slug',)),
+    'title': Field(lambda group: group.title, ('title',)),
+    'description': Field(
+        lambda group: group.description, ('description',)),
+}, ordering=('id',))
+
+FOLLOW = Resource({
+    'id': Field(lambda follow: follow.pk),
+    'user': Embedded('user', USER_FIELDS, user_data, 'users'),
+    'author': Embedded('author', USER_FIELDS, user_data, 'users'),
+}, ordering=('id',))
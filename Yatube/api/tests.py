@@ -0,0 +1,165 @@
+import json
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='api-author')
+        cls.reader = User.objects.create_user(username='api-reader')
+        cls.group = Group.objects.create(
+            title='api-title', slug='api-slug', description='api')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'api {number}')
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='api comment')
+
+    def setUp(self):
+        self.client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def send(self, client, method, url, data):
+        return getattr(client, method)(
+            url, json.dumps(data), content_type='application/json')
+
+    def test_post_list_pages_by_cursor_without_n_plus_one(self):
+        url = reverse('api:post_list')
+        with self.assertNumQueries(1):
+            data = self.client.get(url, {'limit': 3}).json()
+        self.assertEqual(
+            [post['text'] for post in data['results']],
+            ['api 4', 'api 3', 'api 2'],
+        )
+        self.assertEqual(data['results'][0]['author']['username'],
+                         'api-author')
+        self.assertEqual(data['results'][0]['group']['slug'], 'api-slug')
+        self.assertIsNone(data['previous'])
+        data = self.client.get(data['next']).json()
+        self.assertEqual(
+            [post['text'] for post in data['results']], ['api 1', 'api 0'])
+        self.assertIsNone(data['next'])
+
+    def test_sparse_fields_limit_columns(self):
+        url = reverse('api:post_list')
+        with self.assertNumQueries(1) as context:
+            data = self.client.get(url, {'fields': 'id,text'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        sql = context.captured_queries[0]['sql']
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('comments_count', sql)
+        response = self.client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters_and_detail(self):
+        data = self.client.get(
+            reverse('api:post_list'), {'author': 'api-reader'}).json()
+        self.assertEqual(data['results'], [])
+        response = self.client.get(
+            reverse('api:post_detail', args=[self.posts[0].pk]))
+        self.assertEqual(response.json()['comments_count'], 1)
+        response = self.client.get(reverse('api:post_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = self.client.get(
+            reverse('api:group_detail', args=['api-slug'])).json()
+        self.assertEqual(data['title'], 'api-title')
+
+    def test_post_writes(self):
+        url = reverse('api:post_list')
+        self.assertEqual(
+            self.send(self.client, 'post', url, {'text': 'x'}).status_code,
+            401,
+        )
+        response = self.send(
+            self.author_client, 'post', url,
+            {'text': 'api new', 'group': self.group.pk},
+        )
+        self.assertEqual(response.status_code, 201)
+        post_url = reverse('api:post_detail', args=[response.json()['id']])
+        response = self.send(
+            self.reader_client, 'patch', post_url, {'text': 'stolen'})
+        self.assertEqual(response.status_code, 403)
+        response = self.send(
+            self.author_client, 'patch', post_url, {'text': 'api edited'})
+        self.assertEqual(response.json()['text'], 'api edited')
+        self.assertEqual(response.json()['group']['slug'], 'api-slug')
+        response = self.send(
+            self.author_client, 'patch', post_url, {'text': ''})
+        self.assertIn('text', response.json()['errors'])
+        self.assertEqual(
+            self.author_client.delete(post_url).status_code, 204)
+        self.assertEqual(self.client.put(post_url).status_code, 405)
+
+    def test_comments_and_follows(self):
+        url = reverse('api:comment_list', args=[self.posts[0].pk])
+        response = self.send(
+            self.reader_client, 'post', url, {'text': 'api reply'})
+        self.assertEqual(response.status_code, 201)
+        with self.assertNumQueries(2):
+            data = self.client.get(url, {'fields': 'text,author'}).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['results']],
+            ['api comment', 'api reply'],
+        )
+        url = reverse('api:follow_list')
+        response = self.send(
+            self.reader_client, 'post', url, {'author': 'api-author'})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists())
+        data = self.reader_client.get(url).json()
+        self.assertEqual(
+            data['results'][0]['author']['username'], 'api-author')
+        response = self.reader_client.delete(
+            reverse('api:follow_detail', args=['api-author']))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_post_batch_coalesces_lookups(self):
+        other = Post.objects.create(author=self.reader, text='api other')
+        ids = [self.posts[3].pk, 0, other.pk, self.posts[1].pk]
+        url = reverse('api:post_batch')
+        # Посты, авторы, группы и счётчики авторов — по запросу на вид.
+        with self.assertNumQueries(4):
+            data = self.client.get(url, {
+                'ids': ','.join(map(str, ids)),
+                'fields': 'id,author,group,comments_count,'
+                          'author_posts_count,following',
+            }).json()
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [self.posts[3].pk, other.pk, self.posts[1].pk],
+        )
+        self.assertEqual(data['missing'], [0])
+        first = data['results'][0]
+        self.assertEqual(first['author']['username'], 'api-author')
+        self.assertEqual(first['group']['slug'], 'api-slug')
+        self.assertEqual(first['author_posts_count'], 5)
+        self.assertIs(first['following'], False)
+        self.assertIsNone(data['results'][1]['group'])
+        self.assertEqual(
+            self.client.get(url, {'ids': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(
+            url, {'ids': ','.join(map(str, range(1, 102)))}
+        ).status_code, 400)
+
+    def test_list_following_uses_loader(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(reverse('api:post_list'))
+        # Сессия и пользователь, страница постов и один запрос подписок.
+        with self.assertNumQueries(4):
+            data = self.reader_client.get(
+                reverse('api:post_list'), {'fields': 'id,following'}).json()
+        self.assertTrue(all(post['following'] for post in data['results']))
@@ -0,0 +1,246 @@
+import json
+from functools import wraps
+
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+
+from core.sqlite import serialized_write
+from posts.forms import CommentForm, PostForm
+from posts.loaders import get_loader
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import CURSOR_PARAM, CursorPage, CursorPaginator
+
+from . import serializers
+from .serializers import COMMENT, FOLLOW, GROUP, POST
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+BATCH_MAX = 100
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail, **extra):
+        super().__init__(detail)
+        self.status = status
+        self.data = {'detail': detail, **extra}
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        serializers.dumps(data),
+        content_type='application/json',
+        status=status,
+    )
+
+
+def api_view(*methods):
+    """Методы ресурса; ошибки и отказы отвечают JSON, а не HTML-страницей.
+
+    Запись доступна только вошедшим пользователям (сессия и CSRF-токен,
+    как у форм сайта).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = json_response(
+                    {'detail': 'Метод не поддерживается'}, status=405)
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                if (request.method not in SAFE_METHODS
+                        and not request.user.is_authenticated):
+                    raise ApiError(401, 'Нужна авторизация')
+                return view(request, *args, **kwargs)
+            except ApiError as error:
+                return json_response(error.data, status=error.status)
+            except Http404:
+                return json_response({'detail': 'Не найдено'}, status=404)
+            except PermissionDenied:
+                return json_response({'detail': 'Нет доступа'}, status=403)
+        return wrapper
+    return decorator
+
+
+def read_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError(400, 'Тело запроса — не JSON')
+    if not isinstance(data, dict):
+        raise ApiError(400, 'Ожидается JSON-объект')
+    return data
+
+
+def field_names(request, resource):
+    try:
+        return resource.parse_fields(request.GET.get('fields'))
+    except ValueError as error:
+        raise ApiError(400, f'Неизвестные поля: {error}')
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, 'limit — не число')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def paginate(request, queryset, resource):
+    """Страница ресурса по курсору: results, next и previous."""
+    names = field_names(request, resource)
+    paginator = CursorPaginator(
+        resource.apply(queryset, names), page_size(request),
+        resource.ordering,
+    )
+    rows, next_cursor, previous_cursor = paginator.get_rows(
+        request.GET.get(CURSOR_PARAM))
+    page = CursorPage(rows, next_cursor, previous_cursor, request.GET)
+    return json_response({
+        'results': resource.dump(rows, names, get_loader(request)),
+        'next': request.path + page.next_url if page.has_next() else None,
+        'previous': request.path + page.previous_url
+        if page.has_previous() else None,
+    })
+
+
+def detail(request, queryset, resource, **lookup):
+    names = field_names(request, resource)
+    obj = get_object_or_404(resource.apply(queryset, names), **lookup)
+    return json_response(
+        resource.dump([obj], names, get_loader(request))[0])
+
+
+def created(request, obj, resource, status=201):
+    return json_response(
+        resource.dump([obj], resource.default, get_loader(request))[0],
+        status=status,
+    )
+
+
+def form_errors(form):
+    return ApiError(400, 'Ошибка в данных', errors={
+        field: list(errors) for field, errors in form.errors.items()
+    })
+
+
+@api_view('GET', 'POST')
+def post_list(request):
+    if request.method == 'POST':
+        form = PostForm(read_body(request))
+        if not form.is_valid():
+            raise form_errors(form)
+        post = form.save(commit=False)
+        post.author = request.user
+        serialized_write(post.save)
+        return created(request, post, POST)
+    posts = Post.objects.all()
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+    if request.GET.get('group'):
+        posts = posts.filter(group__slug=request.GET['group'])
+    return paginate(request, posts, POST)
+
+
+@api_view('GET')
+def post_batch(request):
+    """Посты по списку ?ids=1,2,3 в том же порядке.
+
+    Посты, авторы, группы и подписки читаются загрузчиком — по одному
+    IN-запросу на вид данных, сколько бы постов ни было в пакете.
+    """
+    try:
+        ids = list(dict.fromkeys(
+            int(value) for value in request.GET.get('ids', '').split(',')
+            if value.strip()
+        ))
+    except ValueError:
+        raise ApiError(400, 'ids — список чисел через запятую')
+    if not ids or len(ids) > BATCH_MAX:
+        raise ApiError(400, f'Нужно от 1 до {BATCH_MAX} ids')
+    names = field_names(request, POST)
+    loader = get_loader(request)
+    posts = loader.posts.get_many(ids)
+    return json_response({
+        'results': POST.dump(
+            [posts[pk] for pk in ids if posts[pk] is not None],
+            names, loader, batched=True,
+        ),
+        'missing': [pk for pk in ids if posts[pk] is None],
+    })
+
+
+@api_view('GET', 'PATCH', 'DELETE')
+def post_detail(request, post_id):
+    if request.method == 'GET':
+        return detail(request, Post.objects.all(), POST, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id)
+    if post.author_id != request.user.pk:
+        raise PermissionDenied
+    if request.method == 'DELETE':
+        serialized_write(post.delete)
+        return HttpResponse(status=204)
+    data = {'text': post.text, 'group': post.group_id, **read_body(request)}
+    form = PostForm(data, instance=post)
+    if not form.is_valid():
+        raise form_errors(form)
+    post = serialized_write(form.save)
+    return created(request, post, POST, status=200)
+
+
+@api_view('GET', 'POST')
+def comment_list(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    if request.method == 'POST':
+        form = CommentForm(read_body(request))
+        if not form.is_valid():
+            raise form_errors(form)
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = post
+        serialized_write(comment.save)
+        return created(request, comment, COMMENT)
+    # Не post.comments: менеджер связи читает post_id у каждого объекта,
+    # а при ?fields= без post это лишний запрос на комментарий.
+    return paginate(request, Comment.objects.filter(post=post), COMMENT)
+
+
+@api_view('GET')
+def group_list(request):
+    return paginate(request, Group.objects.all(), GROUP)
+
+
+@api_view('GET')
+def group_detail(request, slug):
+    return detail(request, Group.objects.all(), GROUP, slug=slug)
+
+
+@api_view('GET', 'POST')
+def follow_list(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация')
+    if request.method == 'POST':
+        username = read_body(request).get('author')
+        author = get_object_or_404(User, username=username)
+        if author == request.user:
+            raise ApiError(400, 'Нельзя подписаться на себя')
+        follow, is_new = serialized_write(
+            Follow.objects.get_or_create, user=request.user, author=author)
+        return created(
+            request, follow, FOLLOW, status=201 if is_new else 200)
+    return paginate(
+        request, Follow.objects.filter(user=request.user), FOLLOW)
+
+
+@api_view('DELETE')
+def follow_detail(request, username):
+    author = get_object_or_404(User, username=username)
+    deleted, _ = serialized_write(
+        Follow.objects.filter(user=request.user, author=author).delete)
+    if not deleted:
+        raise Http404
+    return HttpResponse(status=204)
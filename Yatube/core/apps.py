@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.utils.module_loading import autodiscover_modules
+
+from . import metrics, sqlite
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        autodiscover_modules('tasks')
+        connection_created.connect(metrics.install_query_wrapper)
+        connection_created.connect(sqlite.apply_pragmas)
@@ -0,0 +1,260 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, '
+    'accessed REAL NOT NULL, size INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, expires REAL)',
+)
+
+_missing = object()
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов одной машины.
+
+    Вытесняет давно не читавшиеся записи, когда суммарный размер значений
+    превышает MAX_SIZE, и считает попадания и промахи в текущем процессе.
+
+    Параметры OPTIONS:
+        MAX_SIZE — предельный размер значений в байтах;
+        CULL_EVERY — раз в сколько записей проверять размер;
+        ACCESS_RESOLUTION — как часто (в секундах) обновлять время чтения;
+        LOCK_TIMEOUT — сколько ждать чужого пересчёта в single_flight.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_size = options.get('MAX_SIZE', 64 * 1024 * 1024)
+        self.cull_every = options.get('CULL_EVERY', 32)
+        self.access_resolution = options.get('ACCESS_RESOLUTION', 10)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 30)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._sets = 0
+
+    @property
+    def connection(self):
+        # Соединение нельзя переносить в дочерний процесс после fork.
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.lock_timeout,
+                isolation_level=None,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def _count(self, hit):
+        metrics.record_cache(hit)
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _write(self, key, value, timeout, replace):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT'
+        connection = self.connection
+        try:
+            with connection:
+                if not replace:
+                    connection.execute(
+                        'DELETE FROM cache WHERE key = ? AND expires < ?',
+                        (key, now),
+                    )
+                connection.execute(
+                    f'{verb} INTO cache (key, value, expires, accessed, size) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (
+                        key, data, self.get_backend_timeout(timeout), now,
+                        len(data),
+                    ),
+                )
+        except sqlite3.IntegrityError:
+            return False
+        self._sets += 1
+        if self._sets % self.cull_every == 0:
+            self.cull()
+        return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._write(key, value, timeout, replace=False)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(key, value, timeout, replace=True)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version)
+        return []
+
+    def _read(self, key):
+        row = self.connection.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (row[1] is not None and row[1] < now):
+            return _missing
+        if now - row[2] > self.access_resolution:
+            with self.connection as connection:
+                connection.execute(
+                    'UPDATE cache SET accessed = ? WHERE key = ?', (now, key)
+                )
+        return pickle.loads(row[0])
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        value = self._read(key)
+        self._count(value is not _missing)
+        return default if value is _missing else value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for key in keys:
+            value = self.get(key, _missing, version)
+            if value is not _missing:
+                found[key] = value
+        return found
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self.connection as connection:
+            updated = connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ?',
+                (self.get_backend_timeout(timeout), key),
+            ).rowcount
+        return bool(updated)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self.connection as connection:
+            deleted = connection.execute(
+                'DELETE FROM cache WHERE key = ?', (key,)
+            ).rowcount
+        return bool(deleted)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._read(key) is not _missing
+
+    def clear(self):
+        with self.connection as connection:
+            connection.execute('DELETE FROM cache')
+            connection.execute('DELETE FROM locks')
+
+    def cull(self):
+        """Удаляет просроченные записи, затем самые давно читавшиеся."""
+        with self.connection as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE expires < ?', (time.time(),)
+            )
+            total = connection.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM cache'
+            ).fetchone()[0]
+            if total <= self.max_size:
+                return
+            target = total - self.max_size * 0.9
+            freed = 0
+            keys = []
+            for key, size in connection.execute(
+                'SELECT key, size FROM cache ORDER BY accessed'
+            ):
+                keys.append((key,))
+                freed += size
+                if freed >= target:
+                    break
+            connection.executemany('DELETE FROM cache WHERE key = ?', keys)
+
+    def _acquire(self, key):
+        now = time.time()
+        try:
+            with self.connection as connection:
+                connection.execute(
+                    'DELETE FROM locks WHERE key = ? AND expires < ?',
+                    (key, now),
+                )
+                connection.execute(
+                    'INSERT INTO locks (key, expires) VALUES (?, ?)',
+                    (key, now + self.lock_timeout),
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    @contextmanager
+    def single_flight(self, key, version=None):
+        """Пускает пересчёт значения только в один процесс или поток.
+
+        Остальные ждут освобождения блокировки (не дольше LOCK_TIMEOUT) и
+        затем сами перечитывают кэш.
+        """
+        key = 'lock:' + self.make_and_validate_key(key, version=version)
+        deadline = time.time() + self.lock_timeout
+        acquired = self._acquire(key)
+        while not acquired and time.time() < deadline:
+            time.sleep(0.05)
+            acquired = self._acquire(key)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with self.connection as connection:
+                    connection.execute(
+                        'DELETE FROM locks WHERE key = ?', (key,)
+                    )
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, _missing, version)
+        if value is not _missing:
+            return value
+        with self.single_flight(key, version):
+            value = self.get(key, _missing, version)
+            if value is _missing:
+                value = default() if callable(default) else default
+                if value is not None:
+                    self.set(key, value, timeout, version)
+        return value
+
+    def stats(self):
+        entries, size = self.connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache'
+        ).fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'size': size,
+        }
+
+    def close(self, **kwargs):
+        # Соединение живёт в потоке дольше запроса: не закрываем его
+        # на request_finished, как и LocMemCache.
+        pass
@@ -0,0 +1,7 @@
+from django.conf import settings
+
+
+def page_cache_timeout(request):
+    return {
+        'page_cache_timeout': settings.PAGE_CACHE_TIMEOUT
+    }
@@ -0,0 +1,176 @@
+import datetime
+import logging
+import time
+import traceback
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Max, Q
+from django.utils import timezone
+
+from .models import Job, PeriodicRun
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def job(name):
+    """Регистрирует функцию как задачу очереди под именем name."""
+    def decorator(func):
+        registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, key=None, **payload):
+    """Ставит задачу в очередь; повторный ключ обновляет ждущую запись.
+
+    В режиме JOBS_EAGER задача выполняется сразу, без записи в таблицу;
+    её ошибка, как и в execute, пишется в лог и не роняет запрос.
+    """
+    if settings.JOBS_EAGER:
+        try:
+            registry[name](**payload)
+        except Exception:
+            logger.exception('Job %s failed', name)
+        return None
+    values = {
+        'name': name,
+        'payload': payload,
+        'status': Job.PENDING,
+        'attempts': 0,
+        'run_after': timezone.now(),
+        'error': '',
+    }
+    if key is None:
+        return Job.objects.create(**values)
+    # Выполняемую запись не трогаем: сброс её статуса дал бы второй
+    # запуск той же задачи. Обновляется только ждущая, иначе ставится
+    # новая.
+    pending = Job.objects.filter(key=key, status=Job.PENDING)
+    while True:
+        if pending.update(**values):
+            return pending.first()
+        try:
+            with transaction.atomic():
+                return Job.objects.create(key=key, **values)
+        except IntegrityError:
+            continue
+
+
+def periodic(name):
+    """Регистрирует периодическую задачу; она получает elapsed — секунды
+    с прошлого выполнения.
+
+    Выполнение отмечается в PeriodicRun условным UPDATE, поэтому из
+    одновременных запусков работает один, а пропущенные интервалы не
+    теряются: следующий запуск получит всё прошедшее время. Самый первый
+    запуск только запоминает время.
+    """
+    def decorator(func):
+        @wraps(func)
+        def run():
+            elapsed = claim_period(name)
+            if elapsed is not None:
+                func(elapsed)
+        registry[name] = run
+        return func
+    return decorator
+
+
+def claim_period(name):
+    now = timezone.now()
+    last_run = PeriodicRun.objects.filter(name=name).values_list(
+        'last_run', flat=True).first()
+    if last_run is None:
+        PeriodicRun.objects.get_or_create(
+            name=name, defaults={'last_run': now})
+        return None
+    claimed = PeriodicRun.objects.filter(
+        name=name, last_run=last_run).update(last_run=now)
+    return (now - last_run).total_seconds() if claimed else None
+
+
+def enqueue_periodic(name, interval):
+    """Ставит периодическую задачу, если с её выполнения прошло interval с.
+
+    Время выполнения хранится в PeriodicRun, а не в строке очереди,
+    поэтому с JOBS_EAGER задача тоже выполняется раз в интервал.
+    """
+    since = timezone.now() - datetime.timedelta(seconds=interval)
+    if PeriodicRun.objects.filter(name=name, last_run__gt=since).exists():
+        return None
+    return enqueue(name, key=f'periodic:{name}')
+
+
+def enqueue_due():
+    """Ставит задачи JOBS_PERIODIC, у которых истёк интервал."""
+    for name, interval in settings.JOBS_PERIODIC.items():
+        enqueue_periodic(name, interval)
+
+
+def claim(limit):
+    """Забирает до limit готовых задач и помечает их выполняемыми."""
+    now = timezone.now()
+    stale = now - datetime.timedelta(seconds=settings.JOBS_STALE_AFTER)
+    candidates = Job.objects.filter(
+        Q(status=Job.PENDING, run_after__lte=now)
+        | Q(status=Job.RUNNING, started__lt=stale)
+    ).order_by('run_after').values_list('pk', 'status')[:limit]
+    claimed = []
+    for job_id, status in candidates:
+        updated = Job.objects.filter(pk=job_id, status=status).update(
+            status=Job.RUNNING,
+            started=now,
+            attempts=F('attempts') + 1,
+        )
+        if updated:
+            claimed.append(job_id)
+    return claimed
+
+
+def execute(job_id):
+    """Выполняет задачу и записывает результат, время и повтор при ошибке."""
+    job = Job.objects.get(pk=job_id)
+    start = time.perf_counter()
+    try:
+        registry[job.name](**job.payload)
+    except Exception:
+        job.duration = time.perf_counter() - start
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + datetime.timedelta(
+                seconds=settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Job.FAILED
+            job.finished = timezone.now()
+        logger.exception('Job %s (%s) failed', job.pk, job.name)
+    else:
+        job.duration = time.perf_counter() - start
+        job.status = Job.DONE
+        job.finished = timezone.now()
+        job.error = ''
+    job.save(update_fields=(
+        'status', 'run_after', 'finished', 'duration', 'error'
+    ))
+    return job.pk, job.name, job.status, job.duration
+
+
+def run_pending(limit=100):
+    """Выполняет готовые задачи в текущем процессе."""
+    return [execute(job_id) for job_id in claim(limit)]
+
+
+def stats():
+    """Сводка по задачам: количество и время выполнения по именам."""
+    return Job.objects.filter(duration__isnull=False).values(
+        'name', 'status'
+    ).annotate(
+        count=Count('pk'),
+        avg_duration=Avg('duration'),
+        max_duration=Max('duration'),
+    ).order_by('name', 'status')
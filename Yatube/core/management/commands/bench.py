@@ -0,0 +1,216 @@
+import json
+import time
+from urllib.error import HTTPError
+from urllib.parse import urljoin
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+
+from core.management.commands.loadtest import percentile
+from posts.models import Group, Post, User
+from posts.syndication import follow_token
+
+NAMESPACES = ('posts', 'users', 'about', 'api')
+GUEST = 'guest'
+USER = 'user'
+# Адрес вне INTERNAL_IPS, чтобы debug toolbar не попадал в замеры.
+REMOTE_ADDR = '192.0.2.1'
+
+
+def routes():
+    """Имена маршрутов и имена их аргументов из NAMESPACES."""
+    for resolver in get_resolver().url_patterns:
+        if not isinstance(resolver, URLResolver):
+            continue
+        if resolver.namespace not in NAMESPACES:
+            continue
+        for pattern in resolver.url_patterns:
+            yield (
+                f'{resolver.namespace}:{pattern.name}',
+                tuple(pattern.pattern.converters),
+            )
+
+
+def samples():
+    """Значения аргументов маршрутов из самых «тяжёлых» данных базы."""
+    author = User.objects.annotate(
+        total=Count('posts')).order_by('-total').first()
+    popular = User.objects.exclude(pk=getattr(author, 'pk', None)).order_by(
+        '-stats__followers_count').first()
+    group = Group.objects.annotate(
+        total=Count('posts')).order_by('-total').first()
+    post = Post.objects.filter(author=author).order_by(
+        '-comments_count').first()
+    if None in (author, popular, group, post):
+        raise CommandError(
+            'В базе нет данных для замеров: запустите manage.py seedbench')
+    return author, {
+        'username': popular.username,
+        'slug': group.slug,
+        'post_id': post.pk,
+        'fmt': 'atom',
+        'token': follow_token(author),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет все маршруты posts, users и about: задержку p50/p95/p99, '
+        'число запросов к БД и размер ответа; сравнивает с базовой линией'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--server',
+            help='Адрес запущенного сервера; без него запросы идут через '
+                 'тестовый клиент (только так считаются запросы к БД)',
+        )
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            default=(),
+            help='Имена маршрутов, например posts:index',
+        )
+        parser.add_argument('--save', help='Записать результат в JSON')
+        parser.add_argument('--baseline', help='JSON для сравнения')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Допустимый рост p95 относительно базовой линии',
+        )
+        parser.add_argument(
+            '--min-delta',
+            type=float,
+            default=2.0,
+            help='Рост p95 меньше этого числа миллисекунд не считается',
+        )
+
+    def measure(self, fetch, options):
+        for _ in range(options['warmup']):
+            fetch()
+        latencies, queries = [], []
+        for _ in range(options['iterations']):
+            if options['cold']:
+                cache.clear()
+            status, size, latency, count = fetch()
+            latencies.append(latency)
+            queries.append(count)
+        return {
+            'status': status,
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'queries': None if options['server'] else max(queries),
+            'bytes': size,
+        }
+
+    def client_fetch(self, client, url, user):
+        def fetch():
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    size = sum(
+                        len(chunk) for chunk in response.streaming_content)
+                else:
+                    size = len(response.content)
+                latency = time.perf_counter() - start
+            if user is not None and not response.wsgi_request.user.pk:
+                # Маршрут выхода разлогинил клиента.
+                client.force_login(user)
+            return response.status_code, size, latency, len(context)
+        return fetch
+
+    def server_fetch(self, url):
+        def fetch():
+            start = time.perf_counter()
+            try:
+                with urlopen(url, timeout=30) as response:
+                    status, size = response.status, len(response.read())
+            except HTTPError as error:
+                status, size = error.code, len(error.read())
+            return status, size, time.perf_counter() - start, None
+        return fetch
+
+    def compare(self, results, baseline, options):
+        regressions = []
+        for key, result in results.items():
+            base = baseline.get(key)
+            if base is None:
+                continue
+            if (result['queries'] is not None
+                    and base.get('queries') is not None
+                    and result['queries'] > base['queries']):
+                regressions.append(
+                    f"{key}: запросов {base['queries']} → {result['queries']}"
+                )
+            grown = result['p95_ms'] - base['p95_ms']
+            if (grown > options['min_delta']
+                    and result['p95_ms'] > base['p95_ms']
+                    * (1 + options['tolerance'])):
+                regressions.append(
+                    f"{key}: p95 {base['p95_ms']} → {result['p95_ms']} мс"
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        user, values = samples()
+        if options['server']:
+            fetchers = {GUEST: lambda url: self.server_fetch(
+                urljoin(options['server'], url))}
+        else:
+            guest = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0],
+                           REMOTE_ADDR=REMOTE_ADDR)
+            authorized = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0],
+                                REMOTE_ADDR=REMOTE_ADDR)
+            authorized.force_login(user)
+            fetchers = {
+                GUEST: lambda url: self.client_fetch(guest, url, None),
+                USER: lambda url: self.client_fetch(authorized, url, user),
+            }
+        results = {}
+        for name, arguments in routes():
+            if options['only'] and name not in options['only']:
+                continue
+            url = reverse(name, kwargs={
+                argument: values[argument] for argument in arguments
+            } or None)
+            for mode, fetcher in fetchers.items():
+                result = self.measure(fetcher(url), options)
+                results[f'{name} {mode}'] = result
+                queries = result['queries']
+                self.stdout.write(
+                    f"{name:<26} {mode:<6} {result['status']:>3} "
+                    f"p50 {result['p50_ms']:>7} p95 {result['p95_ms']:>7} "
+                    f"p99 {result['p99_ms']:>7} мс  "
+                    f"запросов {'-' if queries is None else queries:>3}  "
+                    f"{result['bytes']:>7} байт"
+                )
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2,
+                          sort_keys=True)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                regressions = self.compare(results, json.load(file), options)
+            if regressions:
+                raise CommandError(
+                    'Регрессии относительно базовой линии:\n'
+                    + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
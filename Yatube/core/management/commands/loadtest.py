@@ -0,0 +1,123 @@
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+DEFAULT_PATHS = ('/',)
+
+
+def percentile(values, share):
+    """Перцентиль share (0..1) по выборке; для пустой — 0."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сервер и печатает пропускную способность. '
+        'Для сравнения режимов запустите один и тот же тест против '
+        'WSGI (gunicorn Yatube.wsgi) и ASGI (uvicorn Yatube.asgi:application).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', help='Например, http://127.0.0.1:8000')
+        parser.add_argument(
+            '--paths',
+            nargs='+',
+            default=list(DEFAULT_PATHS),
+            help='Пути, которые запрашиваются по кругу',
+        )
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument(
+            '--slow-read',
+            type=float,
+            default=0.0,
+            help='Пауза перед чтением тела ответа, в секундах: '
+                 'имитирует медленных клиентов',
+        )
+        parser.add_argument(
+            '--label',
+            default='',
+            help='Подпись режима в выводе, например wsgi или asgi',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Вывести результат одной строкой JSON',
+        )
+
+    def handle(self, *args, **options):
+        urls = [urljoin(options['base_url'], path)
+                for path in options['paths']]
+        total = options['requests']
+        slow_read = options['slow_read']
+        latencies = []
+        errors = []
+        counter = iter(range(total))
+        lock = threading.Lock()
+
+        def fetch(url):
+            start = time.perf_counter()
+            try:
+                with urlopen(Request(url), timeout=30) as response:
+                    if slow_read:
+                        time.sleep(slow_read)
+                    response.read()
+            except HTTPError as error:
+                return time.perf_counter() - start, error.code
+            except URLError as error:
+                return time.perf_counter() - start, str(error.reason)
+            return time.perf_counter() - start, None
+
+        def worker():
+            while True:
+                with lock:
+                    number = next(counter, None)
+                if number is None:
+                    return
+                latency, error = fetch(urls[number % len(urls)])
+                with lock:
+                    latencies.append(latency)
+                    if error is not None:
+                        errors.append(error)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            for _ in range(options['concurrency']):
+                executor.submit(worker)
+        elapsed = time.perf_counter() - started
+        result = {
+            'label': options['label'],
+            'requests': len(latencies),
+            'errors': len(errors),
+            'concurrency': options['concurrency'],
+            'seconds': round(elapsed, 3),
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'mean_ms': round(
+                statistics.fmean(latencies) * 1000 if latencies else 0.0, 1
+            ),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+            return
+        label = f"[{result['label']}] " if result['label'] else ''
+        self.stdout.write(
+            f"{label}{result['requests']} запросов за {result['seconds']} с, "
+            f"{result['rps']} запр./с, ошибок: {result['errors']}"
+        )
+        self.stdout.write(
+            f"задержка, мс: p50 {result['p50_ms']}, p95 {result['p95_ms']}, "
+            f"p99 {result['p99_ms']}, среднее {result['mean_ms']}"
+        )
@@ -0,0 +1,82 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+
+def _init_worker():
+    django.setup()
+    connections.close_all()
+
+
+def _execute(job_id):
+    try:
+        return jobs.execute(job_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=20,
+            help='Сколько задач забирать из очереди за раз',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Пауза, когда очередь пуста, в секундах',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и выйти',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Показать время выполнения задач и выйти',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.show_stats()
+            return
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=options['processes'],
+            initializer=_init_worker,
+        ) as pool:
+            while True:
+                jobs.enqueue_due()
+                claimed = jobs.claim(options['batch'])
+                connections.close_all()
+                if not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+                futures = [pool.submit(_execute, job_id) for job_id in claimed]
+                for future in as_completed(futures):
+                    job_id, name, status, duration = future.result()
+                    self.stdout.write(
+                        f'{job_id} {name}: {status} за {duration:.3f} с'
+                    )
+
+    def show_stats(self):
+        for row in jobs.stats():
+            self.stdout.write(
+                f"{row['name']} [{row['status']}]: {row['count']} шт., "
+                f"среднее {row['avg_duration']:.3f} с, "
+                f"максимум {row['max_duration']:.3f} с"
+            )
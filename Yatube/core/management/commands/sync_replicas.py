@@ -0,0 +1,61 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from core import routers
+
+
+def copy_database(source, target):
+    """Копия SQLite-базы через backup API: целостная даже под записью."""
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(target)
+    try:
+        source_connection.backup(target_connection)
+    finally:
+        target_connection.close()
+        source_connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную SQLite-базу в файлы реплик из '
+        'DATABASE_REPLICAS — локальная замена репликации'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Повторять каждые N секунд; без него — одна копия',
+        )
+
+    def handle(self, *args, **options):
+        databases = settings.DATABASES
+        aliases = settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError(
+                'Реплик нет: задайте YATUBE_DB_REPLICAS=<число>')
+        engines = {databases[alias]['ENGINE']
+                   for alias in (DEFAULT_DB_ALIAS, *aliases)}
+        if engines != {'django.db.backends.sqlite3'}:
+            raise CommandError(
+                'Копировать можно только SQLite; другие СУБД реплицируют '
+                'себя сами')
+        source = databases[DEFAULT_DB_ALIAS]['NAME']
+        while True:
+            start = time.perf_counter()
+            for alias in aliases:
+                # Копия содержит всё, что закоммичено до начала backup.
+                synced = time.time()
+                copy_database(source, databases[alias]['NAME'])
+                routers.mark_synced(alias, synced)
+            self.stdout.write(
+                f'Реплики {", ".join(aliases)} обновлены за '
+                f'{time.perf_counter() - start:.2f} с'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
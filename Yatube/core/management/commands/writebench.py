@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection
+from django.db import connections, transaction
+from django.test.utils import override_settings
+
+from core.management.commands.loadtest import percentile
+from core.sqlite import serialized_write
+from posts.models import Comment, Post, User
+
+PREFIX = 'writebench'
+MODES = {
+    'plain': {'SQLITE_TUNING': False, 'SQLITE_SERIALIZED_WRITES': False},
+    'pragmas': {'SQLITE_TUNING': True, 'SQLITE_SERIALIZED_WRITES': False},
+    'tuned': {'SQLITE_TUNING': True, 'SQLITE_SERIALIZED_WRITES': True},
+}
+
+
+def add_comment(post_id, author, text):
+    # Как add_comment: чтение поста и запись в одной транзакции, чтобы
+    # воспроизвести повышение блокировки с чтения до записи.
+    with transaction.atomic():
+        post = Post.objects.only('id').get(pk=post_id)
+        return Comment.objects.create(post=post, author=author, text=text)
+
+
+class Command(BaseCommand):
+    help = (
+        'Пишет комментарии из нескольких потоков и сравнивает режимы '
+        'SQLite: plain (как есть), pragmas (WAL и PRAGMA) и tuned '
+        '(PRAGMA и поток-писатель). '
+        'Работает с настоящей базой и удаляет свои записи в конце'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--writes',
+            type=int,
+            default=100,
+            help='Записей на поток',
+        )
+        parser.add_argument(
+            '--modes', nargs='+', choices=tuple(MODES),
+            default=list(MODES),
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Вывести результат одной строкой JSON',
+        )
+
+    def worker(self, post_id, author, writes, result):
+        try:
+            for number in range(writes):
+                start = time.perf_counter()
+                try:
+                    serialized_write(
+                        add_comment, post_id, author, f'{PREFIX} {number}')
+                except OperationalError as error:
+                    key = 'locked' if 'locked' in str(error) else 'errors'
+                    result[key] += 1
+                else:
+                    result['latencies'].append(time.perf_counter() - start)
+        finally:
+            connections.close_all()
+
+    def run_mode(self, mode, post_id, author, options):
+        with override_settings(**MODES[mode]):
+            connections.close_all()
+            if mode == 'plain':
+                # WAL сохраняется в файле базы: возвращаем журнал по умолчанию.
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode = DELETE')
+            results = [
+                {'locked': 0, 'errors': 0, 'latencies': []}
+                for _ in range(options['threads'])
+            ]
+            threads = [
+                threading.Thread(
+                    target=self.worker,
+                    args=(post_id, author, options['writes'], result),
+                )
+                for result in results
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            connections.close_all()
+        latencies = [
+            value for result in results for value in result['latencies']
+        ]
+        return {
+            'mode': mode,
+            'writes': len(latencies),
+            'writes_per_s': round(len(latencies) / elapsed, 1),
+            'locked': sum(result['locked'] for result in results),
+            'errors': sum(result['errors'] for result in results),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        }
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            raise CommandError('Замер нужен для SQLite-базы в файле')
+        author, _ = User.objects.get_or_create(username=PREFIX)
+        post, _ = Post.objects.get_or_create(author=author, text=PREFIX)
+        reports = []
+        try:
+            for mode in options['modes']:
+                reports.append(
+                    self.run_mode(mode, post.pk, author, options))
+        finally:
+            post.delete()
+            author.delete()
+        if options['json']:
+            self.stdout.write(json.dumps(reports, ensure_ascii=False))
+            return
+        for report in reports:
+            self.stdout.write(
+                f"{report['mode']:<7} {report['writes']:>6} записей  "
+                f"{report['writes_per_s']:>8} в с  "
+                f"locked {report['locked']:>4}  ошибок {report['errors']:>3}  "
+                f"p50 {report['p50_ms']:>7} p95 {report['p95_ms']:>7} мс"
+            )
+        self.stdout.write(
+            f'База: {settings.DATABASES[DEFAULT_DB_ALIAS]["NAME"]}')
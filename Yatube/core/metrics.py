@@ -0,0 +1,217 @@
+"""Метрики запросов в памяти процесса в текстовом формате Prometheus.
+
+Каждый процесс считает свои запросы; Prometheus опрашивает /metrics
+всех воркеров и складывает ряды сам.
+"""
+import contextvars
+import threading
+import time
+
+TIME_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = (
+    1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+)
+UNRESOLVED = '<unresolved>'
+
+registry = []
+_current = contextvars.ContextVar('metrics_request', default=None)
+
+
+def _labels(names, values):
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', r'\\').replace(
+            '\n', r'\n').replace('"', r'\"')
+        pairs.append(f'{name}="{value}"')
+    return ','.join(pairs)
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for key, value in sorted(values.items()):
+            yield self.name, _labels(self.labelnames, key), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            counts, total = self.values.get(
+                key, ([0] * len(self.buckets), 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self.values[key] = counts, total + value
+
+    def samples(self):
+        with self.lock:
+            values = {
+                key: (list(counts), total)
+                for key, (counts, total) in self.values.items()
+            }
+        for key, (counts, total) in sorted(values.items()):
+            labels = _labels(self.labelnames, key)
+            prefix = labels + ',' if labels else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield (f'{self.name}_bucket',
+                       f'{prefix}le="{_number(bound)}"', cumulative)
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+
+def render():
+    """Все метрики процесса в текстовом формате Prometheus 0.0.4."""
+    lines = []
+    for metric in registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in metric.samples():
+            labels = '{' + labels + '}' if labels else ''
+            lines.append(f'{name}{labels} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+REQUESTS = Counter(
+    'yatube_requests_total', 'Запросы по представлению, методу и статусу.',
+    ('view', 'method', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    'yatube_request_duration_seconds', 'Время построения ответа.',
+    TIME_BUCKETS, ('view',),
+)
+DB_QUERIES = Histogram(
+    'yatube_db_queries', 'Запросов к БД на один запрос.',
+    COUNT_BUCKETS, ('view',),
+)
+DB_DURATION = Histogram(
+    'yatube_db_duration_seconds', 'Время запросов к БД.',
+    TIME_BUCKETS, ('view',),
+)
+TEMPLATE_DURATION = Histogram(
+    'yatube_template_duration_seconds', 'Время отрисовки шаблонов.',
+    TIME_BUCKETS, ('view',),
+)
+RESPONSE_SIZE = Histogram(
+    'yatube_response_size_bytes', 'Размер тела ответа.',
+    SIZE_BUCKETS, ('view',),
+)
+CACHE = Counter(
+    'yatube_cache_requests_total', 'Обращения к кэшу: попадания и промахи.',
+    ('view', 'result'),
+)
+
+
+class RequestStats:
+    """Счётчики одного запроса; пополняются и из потоков sync_to_async."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, **amounts):
+        with self.lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+
+def activate(stats):
+    return _current.set(stats)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def _add(**amounts):
+    stats = _current.get()
+    if stats is not None:
+        stats.add(**amounts)
+
+
+def record_template(seconds):
+    _add(template_time=seconds)
+
+
+def record_cache(hit):
+    if hit:
+        _add(cache_hits=1)
+    else:
+        _add(cache_misses=1)
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка connection.execute_wrapper: число и время запросов."""
+    if _current.get() is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        _add(queries=1, db_time=time.perf_counter() - start)
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """Обработчик connection_created: подключает record_query."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def observe_request(request, response, seconds, stats):
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match is not None else UNRESOLVED
+    REQUESTS.inc(view=view, method=request.method,
+                 status=response.status_code)
+    REQUEST_DURATION.observe(seconds, view=view)
+    DB_QUERIES.observe(stats.queries, view=view)
+    DB_DURATION.observe(stats.db_time, view=view)
+    TEMPLATE_DURATION.observe(stats.template_time, view=view)
+    if not response.streaming:
+        RESPONSE_SIZE.observe(len(response.content), view=view)
+    if stats.cache_hits:
+        CACHE.inc(stats.cache_hits, view=view, result='hit')
+    if stats.cache_misses:
+        CACHE.inc(stats.cache_misses, view=view, result='miss')
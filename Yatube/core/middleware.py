@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+from django.conf import settings
+
+from . import metrics, routers
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class MetricsMiddleware:
+    """Собирает метрики запроса: время, запросы к БД, шаблоны, кэш.
+
+    Стоит первой в цепочке, поэтому под ASGI работает асинхронно, чтобы
+    не переводить всю цепочку в поток через sync_to_async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = asyncio.iscoroutinefunction(get_response)
+        if self.async_mode:
+            # Как MiddlewareMixin в Django 4.0: по этой метке обработчик
+            # считает __call__ корутиной.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = metrics.RequestStats()
+        token = metrics.activate(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        metrics.observe_request(
+            request, response, time.perf_counter() - start, stats
+        )
+        return response
+
+    async def __acall__(self, request):
+        stats = metrics.RequestStats()
+        token = metrics.activate(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        metrics.observe_request(
+            request, response, time.perf_counter() - start, stats
+        )
+        return response
+
+
+class ReplicaMiddleware:
+    """Пускает на реплики чтения, кроме чтений сразу после записи.
+
+    Небезопасные методы работают с основной базой и ставят cookie; пока
+    она жива, запросы этого клиента тоже не идут на реплики, которые
+    могут отставать.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = asyncio.iscoroutinefunction(get_response)
+        if self.async_mode:
+            # Как MiddlewareMixin в Django 4.0: по этой метке обработчик
+            # считает __call__ корутиной.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        writes, token = self.route(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.reset(token)
+        return self.stick(response, writes)
+
+    async def __acall__(self, request):
+        writes, token = self.route(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.reset(token)
+        return self.stick(response, writes)
+
+    def route(self, request):
+        writes = request.method not in SAFE_METHODS
+        return writes, routers.allow_replicas(
+            not writes and not self.is_sticky(request))
+
+    def stick(self, response, writes):
+        if writes and routers.replicas():
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                str(int(time.time()) + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def is_sticky(self, request):
+        value = request.COOKIES.get(settings.REPLICA_STICKY_COOKIE)
+        try:
+            return int(value) > time.time()
+        except (TypeError, ValueError):
+            return False
@@ -0,0 +1,22 @@
+# Generated by Django 4.0.4 on 2026-10-18 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='key',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='Ключ идемпотентности'),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('key',), name='unique_pending_job_key'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.0.4 on 2026-10-18 05:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_pending_job_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodicRun',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Задача')),
+                ('last_run', models.DateTimeField(verbose_name='Последний запуск')),
+            ],
+        ),
+    ]
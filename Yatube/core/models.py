@@ -0,0 +1,66 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=100)
+    payload = models.JSONField('Аргументы', default=dict, blank=True)
+    key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=200,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    duration = models.FloatField('Время выполнения, с', null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = (
+            # Ключ уникален среди ждущих задач: пока запись выполняется,
+            # рядом может стоять следующая с тем же ключом.
+            models.UniqueConstraint(
+                fields=('key',),
+                condition=models.Q(status='pending'),
+                name='unique_pending_job_key',
+            ),)
+        indexes = (
+            models.Index(
+                fields=('status', 'run_after'),
+                name='job_status_run_after_idx',
+            ),)
+
+    def __str__(self):
+        return f'{self.name} [{self.status}]'
+
+
+class PeriodicRun(models.Model):
+    """Время последнего выполнения периодической задачи."""
+
+    name = models.CharField('Задача', max_length=100, primary_key=True)
+    last_run = models.DateTimeField('Последний запуск')
+
+    def __str__(self):
+        return f'{self.name} @ {self.last_run}'
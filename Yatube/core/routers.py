@@ -0,0 +1,105 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в settings.DATABASE_REPLICAS. С них читают только
+запросы, которые ReplicaMiddleware отметила как чтение; команды, задачи
+и запросы пользователя в течение REPLICA_STICKY_SECONDS после записи
+работают с основной базой и видят свои изменения.
+
+Страницы, которые кэшируются или получают ETag по версиям пространств
+имён, читают только реплики, скопированные после последнего сброса этих
+версий (synced_replicas, only_replicas): иначе старые данные легли бы
+в кэш под новой версией.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SYNCED_KEY = 'replica_synced:{}'
+
+_read_replicas = contextvars.ContextVar('read_replicas', default=False)
+_allowed = contextvars.ContextVar('replica_aliases', default=None)
+
+
+def allow_replicas(value=True):
+    return _read_replicas.set(value)
+
+
+def reset(token):
+    _read_replicas.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Чтения внутри блока идут в основную базу."""
+    token = allow_replicas(False)
+    try:
+        yield
+    finally:
+        reset(token)
+
+
+def mark_synced(alias, timestamp):
+    """Запоминает, что реплика alias содержит записи до timestamp."""
+    cache.set(SYNCED_KEY.format(alias), timestamp, timeout=None)
+
+
+def synced_replicas(since):
+    """Реплики, скопированные не раньше since (секунды с эпохи).
+
+    Пустой список, если чтения с реплик сейчас не разрешены.
+    """
+    aliases = replicas()
+    if not aliases or not _read_replicas.get():
+        return []
+    synced = cache.get_many(
+        [SYNCED_KEY.format(alias) for alias in aliases])
+    return [
+        alias for alias in aliases
+        if synced.get(SYNCED_KEY.format(alias), 0) >= since
+    ]
+
+
+@contextmanager
+def only_replicas(aliases):
+    """Чтения блока идут только на aliases, при пустом списке — в основную
+    базу."""
+    token = _allowed.set(list(aliases))
+    try:
+        yield
+    finally:
+        _allowed.reset(token)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = _allowed.get()
+        if aliases is None:
+            aliases = replicas()
+        if (not aliases or not _read_replicas.get()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            # Внутри транзакции реплика не видит ещё не записанное.
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит вместе с данными основной базы.
+        if db in replicas():
+            return False
+        return None
@@ -0,0 +1,105 @@
+"""Настройка SQLite под конкурентную нагрузку.
+
+Включается переменной YATUBE_SQLITE_TUNING=1: соединения получают
+PRAGMA из settings.SQLITE_PRAGMAS, а записи из представлений идут через
+один поток-писатель процесса, который коммитит их пачками.
+"""
+import contextvars
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db import transaction
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Обработчик connection_created: PRAGMA для каждого соединения."""
+    if not settings.SQLITE_TUNING or connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+class SerializedWriter:
+    """Поток, через который проходят все записи процесса.
+
+    Потоки запросов не борются за блокировку файла, а несколько записей,
+    накопившихся в очереди, коммитятся одной транзакцией; каждая — в своей
+    точке сохранения, поэтому ошибка одной не откатывает остальные.
+    Результат возвращается вызывающему только после коммита.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def submit(self, func, *args, **kwargs):
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Из чужой транзакции отдавать запись другому соединению
+            # нельзя: оно будет ждать блокировку, которую держит вызывающий.
+            return func(*args, **kwargs)
+        self.start()
+        future = Future()
+        context = contextvars.copy_context()
+        self.queue.put((context, func, args, kwargs, future))
+        return future.result()
+
+    def start(self):
+        with self.lock:
+            # После fork поток писателя остаётся в родительском процессе.
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.Queue()
+            threading.Thread(
+                target=self.run, name='sqlite-writer', daemon=True,
+            ).start()
+            self.pid = os.getpid()
+
+    def take_batch(self):
+        batch = [self.queue.get()]
+        size = self.batch_size or settings.SQLITE_WRITE_BATCH
+        while len(batch) < size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.take_batch()
+            close_old_connections()
+            done = []
+            try:
+                with transaction.atomic():
+                    for context, func, args, kwargs, future in batch:
+                        try:
+                            with transaction.atomic():
+                                result = context.run(func, *args, **kwargs)
+                        except Exception as error:
+                            future.set_exception(error)
+                        else:
+                            done.append((future, result))
+            except Exception as error:
+                for _, _, _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for future, result in done:
+                future.set_result(result)
+
+
+writer = SerializedWriter()
+
+
+def serialized_write(func, *args, **kwargs):
+    """Выполняет запись через писателя, если он включён в настройках."""
+    if not settings.SQLITE_SERIALIZED_WRITES:
+        return func(*args, **kwargs)
+    return writer.submit(func, *args, **kwargs)
@@ -0,0 +1,36 @@
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from . import metrics
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.record_template(time.perf_counter() - start)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates, который учитывает время отрисовки в метриках.
+
+    Засекается только внешний шаблон: include и extends отрисовываются
+    внутри него и не считаются дважды.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            self.engine.from_string(template_code), self
+        )
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(
+                self.engine.get_template(template_name), self
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты пишут в свой кэш во временном каталоге.
+
+    Иначе они очищали бы файл кэша запущенного dev-сервера, а версии
+    страниц переходили бы из одного прогона в другой. Задачи очереди
+    выполняются сразу (JOBS_EAGER), без воркера.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        self.cache_directory = tempfile.mkdtemp(prefix='yatube-cache-')
+        self.cache_settings = override_settings(JOBS_EAGER=True, CACHES={
+            alias: {
+                **options,
+                'LOCATION': os.path.join(
+                    self.cache_directory, f'{alias}.sqlite3'
+                ),
+            }
+            for alias, options in settings.CACHES.items()
+        })
+        self.cache_settings.enable()
+        super().setup_test_environment(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
@@ -1,4 +1,53 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.db import IntegrityError, connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.utils import timezone
+
+from core import jobs, metrics, routers
+from core.cache import SQLiteCache
+from core.management.commands.sync_replicas import copy_database
+from core.middleware import MetricsMiddleware, ReplicaMiddleware
+from core.sqlite import SerializedWriter
+from core.models import Job, PeriodicRun
+from posts import cache as page_cache
+from posts.models import FeedEntry, Group, Post, ProfileStats, User
+
+CALLS = []
+
+
+@jobs.job('core.tests.record')
+def record(value):
+    CALLS.append(value)
+
+
+@jobs.job('core.tests.fail')
+def fail():
+    raise RuntimeError('boom')
+
+
+@jobs.periodic('core.tests.periodic')
+def periodic_record(elapsed):
+    CALLS.append(round(elapsed))
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +55,416 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(JOBS_EAGER=False, JOBS_RETRY_DELAY=0)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_and_run(self):
+        jobs.enqueue('core.tests.record', value=1)
+        self.assertEqual(CALLS, [])
+        results = jobs.run_pending()
+        self.assertEqual(CALLS, [1])
+        self.assertEqual(results[0][2], Job.DONE)
+        self.assertIsNotNone(Job.objects.get().duration)
+
+    def test_idempotency_key_deduplicates(self):
+        jobs.enqueue('core.tests.record', key='same', value=1)
+        jobs.enqueue('core.tests.record', key='same', value=2)
+        self.assertEqual(Job.objects.count(), 1)
+        jobs.run_pending()
+        self.assertEqual(CALLS, [2])
+
+    def test_running_job_not_reset_by_same_key(self):
+        running = jobs.enqueue('core.tests.record', key='same', value=1)
+        self.assertEqual(jobs.claim(10), [running.pk])
+        queued = jobs.enqueue('core.tests.record', key='same', value=2)
+        self.assertNotEqual(queued.pk, running.pk)
+        running.refresh_from_db()
+        self.assertEqual(
+            (running.status, running.attempts), (Job.RUNNING, 1))
+        self.assertEqual(jobs.claim(10), [queued.pk])
+
+    def test_failed_job_retried_then_failed(self):
+        job = jobs.enqueue('core.tests.fail')
+        for _ in range(job.max_attempts):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, job.max_attempts)
+        self.assertIn('boom', job.error)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        jobs.enqueue('core.tests.record', value=3)
+        self.assertEqual(CALLS, [3])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode_logs_failure(self):
+        with self.assertLogs('core.jobs', 'ERROR') as logs:
+            self.assertIsNone(jobs.enqueue('core.tests.fail'))
+        self.assertIn('boom', logs.output[0])
+
+    def set_last_run(self, seconds_ago):
+        PeriodicRun.objects.filter(name='core.tests.periodic').update(
+            last_run=timezone.now() - datetime.timedelta(
+                seconds=seconds_ago))
+
+    def test_periodic_job_runs_once_per_interval(self):
+        first = jobs.enqueue_periodic('core.tests.periodic', 60)
+        self.assertIsNotNone(first)
+        self.assertEqual(
+            jobs.enqueue_periodic('core.tests.periodic', 60).pk, first.pk)
+        jobs.run_pending()
+        # Первый запуск только запоминает время.
+        self.assertEqual(CALLS, [])
+        self.assertIsNone(jobs.enqueue_periodic('core.tests.periodic', 60))
+        self.set_last_run(150)
+        jobs.enqueue_periodic('core.tests.periodic', 60)
+        jobs.run_pending()
+        self.assertEqual(CALLS, [150])
+        self.assertIsNone(jobs.enqueue_periodic('core.tests.periodic', 60))
+
+    @override_settings(JOBS_EAGER=True)
+    def test_periodic_job_runs_once_per_interval_in_eager_mode(self):
+        jobs.enqueue_periodic('core.tests.periodic', 60)
+        self.set_last_run(90)
+        for _ in range(3):
+            jobs.enqueue_periodic('core.tests.periodic', 60)
+        self.assertEqual(CALLS, [90])
+        self.assertFalse(Job.objects.exists())
+
+    def test_repeated_periodic_runs_do_not_count_time_twice(self):
+        jobs.registry['core.tests.periodic']()
+        self.set_last_run(60)
+        jobs.registry['core.tests.periodic']()
+        jobs.registry['core.tests.periodic']()
+        self.assertEqual(CALLS, [60, 0])
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(
+            os.path.join(self.directory, 'cache.sqlite3'),
+            {'OPTIONS': {'ACCESS_RESOLUTION': 0, **options}},
+        )
+
+    def test_suite_uses_temporary_cache_file(self):
+        location = settings.CACHES['default']['LOCATION']
+        self.assertTrue(location.startswith(tempfile.gettempdir()))
+        self.assertEqual(caches['default'].path, location)
+
+    def test_shared_between_instances(self):
+        self.cache.set('key', {'value': 1})
+        other = self.make_cache()
+        self.assertEqual(other.get('key'), {'value': 1})
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_touch_and_expiry(self):
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.cache.set('expired', 1, timeout=-1)
+        self.assertNotIn('expired', self.cache)
+        self.assertTrue(self.cache.add('expired', 2))
+        self.assertTrue(self.cache.touch('key', None))
+        self.assertEqual(self.cache.get_many(['key', 'expired', 'no']),
+                         {'key': 1, 'expired': 2})
+
+    def test_hit_and_miss_counters(self):
+        self.cache.set('key', 1)
+        self.cache.get('key')
+        self.cache.get('missing')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['entries'], 1)
+
+    def test_lru_eviction_by_size(self):
+        cache = self.make_cache(MAX_SIZE=3500, CULL_EVERY=1)
+        value = 'x' * 900
+        cache.set('old', value)
+        cache.set('used', value)
+        cache.connection.execute('UPDATE cache SET accessed = 0')
+        cache.get('used')
+        cache.set('new', value)
+        cache.set('newest', value)
+        self.assertIsNone(cache.get('old'))
+        self.assertEqual(cache.get('used'), value)
+        self.assertEqual(cache.get('newest'), value)
+        self.assertLessEqual(cache.stats()['size'], 3500)
+
+    def test_get_or_set_computes_once(self):
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            threading.Event().wait(0.2)
+            return 'value'
+
+        results = []
+
+        def worker():
+            results.append(self.cache.get_or_set('key', compute))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 4)
+
+
+class BenchCommandsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        call_command('seedbench', users=5, groups=2, posts=30, comments=20,
+                     follows=10, stdout=StringIO())
+
+    def bench(self, **options):
+        # Задержка на тестовой машине шумит: сравниваются только запросы.
+        call_command('bench', iterations=1, warmup=0, min_delta=10 ** 6,
+                     only=['posts:index', 'about:tech'], stdout=StringIO(),
+                     **options)
+
+    def test_seed_keeps_denormalized_data_consistent(self):
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(
+            sum(ProfileStats.objects.values_list('posts_count', flat=True)),
+            30,
+        )
+        self.assertTrue(FeedEntry.objects.exists())
+
+    def test_baseline_comparison(self):
+        path = os.path.join(self.directory, 'baseline.json')
+        self.bench(save=path)
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        self.assertEqual(set(baseline), {
+            'posts:index guest', 'posts:index user',
+            'about:tech guest', 'about:tech user',
+        })
+        self.bench(baseline=path)
+        for result in baseline.values():
+            result['queries'] = -1
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(baseline, file)
+        with self.assertRaises(CommandError):
+            self.bench(baseline=path)
+
+
+class MetricsTests(TestCase):
+    def test_request_metrics_exposed(self):
+        user = User.objects.create_user(username='metrics-user')
+        Post.objects.create(text='metrics-post', author=user)
+        self.client.get('/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",method="GET",'
+            'status="200"}', body)
+        for name in ('yatube_db_queries', 'yatube_db_duration_seconds',
+                     'yatube_template_duration_seconds',
+                     'yatube_response_size_bytes'):
+            self.assertIn(f'{name}_count{{view="posts:index"}}', body)
+        self.assertIn(
+            'yatube_cache_requests_total{view="posts:index",result="miss"}',
+            body)
+
+    async def test_middleware_stays_async_under_asgi(self):
+        async def view(request):
+            return HttpResponse('async')
+
+        middleware = MetricsMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        self.assertFalse(asyncio.iscoroutinefunction(
+            MetricsMiddleware(lambda request: HttpResponse())))
+        response = await middleware(RequestFactory().get('/async-metrics'))
+        self.assertEqual(response.content, b'async')
+        self.assertIn(
+            f'yatube_requests_total{{view="{metrics.UNRESOLVED}",'
+            'method="GET",status="200"}', metrics.render())
+
+    @override_settings(METRICS_ALLOWED_IPS=['192.0.2.1'])
+    def test_metrics_restricted_by_ip(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_debug_toolbar_disabled_by_default(self):
+        self.assertNotIn('debug_toolbar', settings.INSTALLED_APPS)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+
+    def read_alias(self, request):
+        aliases = []
+
+        def view(request):
+            aliases.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return aliases[0], response
+
+    def test_only_marked_reads_go_to_replicas(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        token = routers.allow_replicas()
+        try:
+            self.assertEqual(self.router.db_for_read(Post), 'replica1')
+            with routers.use_primary():
+                self.assertEqual(self.router.db_for_read(Post), 'default')
+        finally:
+            routers.reset(token)
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertIs(
+            self.router.allow_migrate('replica1', 'posts'), False)
+
+    def test_reads_stick_to_primary_after_write(self):
+        factory = RequestFactory()
+        alias, _ = self.read_alias(factory.get('/'))
+        self.assertEqual(alias, 'replica1')
+        alias, response = self.read_alias(factory.post('/'))
+        self.assertEqual(alias, 'default')
+        cookie = response.cookies[settings.REPLICA_STICKY_COOKIE].value
+        request = factory.get('/')
+        request.COOKIES[settings.REPLICA_STICKY_COOKIE] = cookie
+        self.assertEqual(self.read_alias(request)[0], 'default')
+        request.COOKIES[settings.REPLICA_STICKY_COOKIE] = '0'
+        self.assertEqual(self.read_alias(request)[0], 'replica1')
+
+    async def test_middleware_stays_async_under_asgi(self):
+        aliases = []
+
+        async def view(request):
+            aliases.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        await middleware(RequestFactory().get('/'))
+        self.assertEqual(aliases, ['replica1'])
+
+    def test_page_renders_read_only_fresh_replicas(self):
+        self.addCleanup(caches['default'].delete,
+                        routers.SYNCED_KEY.format('replica1'))
+        aliases = []
+
+        def view(request):
+            aliases.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        async def async_view(request):
+            aliases.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        def namespaces(request):
+            return ['replica-test']
+
+        cached = page_cache.cache_page_versioned(
+            namespaces, per_user=False)(view)
+        acached = page_cache.acache_page_versioned(namespaces)(async_view)
+        factory = RequestFactory()
+        anonymous = factory.get('/replica-test/async/')
+        anonymous.user = AnonymousUser()
+        token = routers.allow_replicas()
+        try:
+            page_cache.bump('replica-test')
+            cached(factory.get('/replica-test/1/'))
+            routers.mark_synced('replica1', time.time())
+            cached(factory.get('/replica-test/2/'))
+            async_to_sync(acached)(anonymous)
+            page_cache.bump('replica-test')
+            cached(factory.get('/replica-test/3/'))
+            view(None)
+        finally:
+            routers.reset(token)
+        # Реплика скопирована до сброса версии — страницу строит основная
+        # база; после копии — реплика; прочие чтения идут на реплику.
+        self.assertEqual(
+            aliases,
+            ['default', 'replica1', 'replica1', 'default', 'replica1'],
+        )
+
+    def test_copy_database(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        source = os.path.join(directory, 'primary.sqlite3')
+        target = os.path.join(directory, 'replica.sqlite3')
+        connection = sqlite3.connect(source)
+        connection.execute('CREATE TABLE items (value TEXT)')
+        connection.execute("INSERT INTO items VALUES ('copied')")
+        connection.commit()
+        connection.close()
+        copy_database(source, target)
+        connection = sqlite3.connect(target)
+        self.addCleanup(connection.close)
+        self.assertEqual(
+            connection.execute('SELECT value FROM items').fetchall(),
+            [('copied',)],
+        )
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    @override_settings(SQLITE_TUNING=True)
+    def test_pragmas_applied_on_connect(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory, 'tuned.sqlite3'),
+        }, alias='tuned')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class SerializedWriterTests(TransactionTestCase):
+    def test_writes_from_threads_are_committed_in_batches(self):
+        writer = SerializedWriter(batch_size=4)
+        results = []
+
+        def write(number):
+            results.append(writer.submit(
+                Group.objects.create, slug=f'writer-{number}', title='w'))
+
+        threads = [
+            threading.Thread(target=write, args=(number,))
+            for number in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 10)
+        self.assertEqual(
+            Group.objects.filter(slug__startswith='writer-').count(), 10)
+
+    def test_failed_write_raises_in_caller(self):
+        writer = SerializedWriter()
+        writer.submit(Group.objects.create, slug='writer-unique', title='w')
+        with self.assertRaises(IntegrityError):
+            writer.submit(
+                Group.objects.create, slug='writer-unique', title='w')
+        writer.submit(Group.objects.create, slug='writer-next', title='w')
+        self.assertEqual(
+            Group.objects.filter(slug__startswith='writer-').count(), 2)
@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from . import metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +20,13 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+def metrics_view(request):
+    allowed = settings.METRICS_ALLOWED_IPS
+    if allowed and request.META.get('REMOTE_ADDR') not in allowed:
+        raise PermissionDenied
+    return HttpResponse(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
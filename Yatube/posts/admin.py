@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import get_backend
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -16,6 +17,11 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return get_backend().filter(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,113 @@
+"""Асинхронные варианты страниц чтения для запуска через ASGI.
+
+Контекст страниц описан в pages.py и общий с views.py. В Django 4.0
+у ORM нет асинхронного API, поэтому запросы выполняются через
+sync_to_async, а независимые — одновременно в отдельных потоках.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections, connection
+from django.shortcuts import render
+
+from core.routers import only_replicas, use_primary
+
+from . import cache, pages
+
+arender = sync_to_async(render)
+
+
+def _closing(func):
+    def run():
+        try:
+            return func()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather_queries(*funcs):
+    """Выполняет независимые запросы одновременно, каждый в своём потоке.
+
+    Другие соединения не видят данных открытой транзакции (например,
+    в тестах), поэтому внутри неё запросы идут по очереди.
+    """
+    if await sync_to_async(lambda: connection.in_atomic_block)():
+        return [await sync_to_async(func)() for func in funcs]
+    return await asyncio.gather(*(
+        sync_to_async(_closing(func), thread_sensitive=False)()
+        for func in funcs
+    ))
+
+
+def login_required(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if await sync_to_async(lambda: request.user.is_authenticated)():
+            return await view(request, *args, **kwargs)
+        return redirect_to_login(request.get_full_path())
+    return wrapper
+
+
+async def arender_page(request, page, **kwargs):
+    """Как views.render_page, но независимые запросы идут одновременно."""
+    if not page.validators:
+        context = await sync_to_async(page.load)(request, **kwargs)
+        return await _arender_page(request, page, context)
+    with use_primary():
+        context = await sync_to_async(page.load)(request, **kwargs)
+    versions = await sync_to_async(cache.get_versions)(
+        page.validators(context)
+    )
+    not_modified, etag, last_modified = await sync_to_async(
+        cache.check_not_modified
+    )(request, versions)
+    if not_modified is not None:
+        return not_modified
+    aliases = await sync_to_async(cache.fresh_replicas)(versions)
+    with only_replicas(aliases):
+        response = await _arender_page(request, page, context)
+    return cache.set_validators(response, etag, last_modified)
+
+
+async def _arender_page(request, page, context):
+    queries = page.queries(request, context)
+    context.update(zip(queries, await gather_queries(*queries.values())))
+    return await arender(request, page.template, page.finish(context))
+
+
+@cache.acache_page_versioned(pages.index.namespaces)
+async def index(request):
+    return await arender_page(request, pages.index)
+
+
+@cache.acache_page_versioned(pages.popular_posts.namespaces)
+async def popular_posts(request):
+    return await arender_page(request, pages.popular_posts)
+
+
+@cache.acache_page_versioned(pages.group_index.namespaces)
+async def group_index(request):
+    return await arender_page(request, pages.group_index)
+
+
+@cache.acache_page_versioned(pages.group_posts.namespaces)
+async def group_posts(request, slug):
+    return await arender_page(request, pages.group_posts, slug=slug)
+
+
+@cache.acache_page_versioned(pages.profile.namespaces)
+async def profile(request, username):
+    return await arender_page(request, pages.profile, username=username)
+
+
+async def post_detail(request, post_id):
+    return await arender_page(request, pages.post_detail, post_id=post_id)
+
+
+@login_required
+@cache.acache_page_versioned(pages.follow_index.namespaces)
+async def follow_index(request):
+    return await arender_page(request, pages.follow_index)
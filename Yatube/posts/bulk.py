@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+from itertools import islice
+
+
+def batched(iterable, size):
+    """Режет поток на списки по size элементов, не читая его целиком."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def explicit_dates(*models):
+    """Отключает auto_now и auto_now_add у полей моделей.
+
+    Тогда bulk_create сохраняет даты, переданные в объектах. Поля общие для
+    процесса, поэтому контекст предназначен для команд, а не для запросов.
+    """
+    fields = [
+        field
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
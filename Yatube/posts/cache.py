@@ -0,0 +1,256 @@
+import time
+import uuid
+from contextlib import nullcontext
+from functools import wraps
+from hashlib import md5
+from urllib.error import HTTPError
+from urllib.parse import urljoin
+from urllib.request import Request, urlopen
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.cache import CacheMiddleware
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from core import routers
+
+VERSION_KEY = 'page_version:{}'
+INDEX = 'index'
+POPULAR = 'popular'
+GROUPS = 'groups'
+
+
+def group_namespace(slug):
+    return f'group:{slug}'
+
+
+def profile_namespace(username):
+    return f'profile:{username}'
+
+
+def follow_namespace(user_id):
+    return f'follow:{user_id}'
+
+
+def post_namespace(post_id):
+    return f'post:{post_id}'
+
+
+def _new_version():
+    # Версия начинается с времени сброса в микросекундах (hex): из неё
+    # берётся Last-Modified страницы.
+    return '{:x}-{}'.format(time.time_ns() // 1000, uuid.uuid4().hex[:6])
+
+
+def versions_time(versions):
+    """Время последнего сброса среди versions, секунды с эпохи (float)."""
+    stamps = []
+    for version in versions:
+        try:
+            stamps.append(int(version.split('-')[0], 16) / 10 ** 6)
+        except ValueError:
+            continue
+    return max(stamps, default=None)
+
+
+def versions_modified(versions):
+    """Время последнего сброса среди versions, целые секунды с эпохи."""
+    stamp = versions_time(versions)
+    return None if stamp is None else int(stamp)
+
+
+def fresh_replicas(versions):
+    """Реплики, в которых уже есть записи, сбросившие versions.
+
+    Версия без метки времени (чужого формата) реплик не допускает.
+    """
+    stamp = versions_time(versions)
+    if stamp is None:
+        return []
+    return routers.synced_replicas(stamp)
+
+
+def get_versions(namespaces):
+    """Текущие версии пространств имён одним обращением к кэшу."""
+    keys = [VERSION_KEY.format(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*namespaces):
+    """Сбрасывает страницы пространств имён, не трогая остальной кэш."""
+    if namespaces:
+        cache.set_many(
+            {
+                VERSION_KEY.format(namespace): _new_version()
+                for namespace in namespaces
+            },
+            timeout=None,
+        )
+
+
+def _single_flight(key):
+    """Блокировка пересчёта, если бэкенд кэша её поддерживает."""
+    single_flight = getattr(cache, 'single_flight', None)
+    return single_flight(key) if single_flight else nullcontext()
+
+
+def page_validators(request, versions, per_user=True):
+    """ETag и Last-Modified страницы без запросов к ленте.
+
+    Страница меняется только вместе с версиями своих пространств имён,
+    а разметка ещё зависит от пользователя и CSRF-cookie в формах.
+    Без per_user (ленты RSS/Atom) ETag зависит только от версий и адреса,
+    и проверка не читает сессию.
+    """
+    parts = [*versions, request.get_full_path()]
+    if per_user:
+        parts += [
+            str(request.user.pk or ''),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        ]
+    etag = md5(':'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    return quote_etag(etag), versions_modified(versions)
+
+
+def check_not_modified(request, versions, per_user=True):
+    """ETag, Last-Modified и ответ 304, если клиент уже видел эти версии."""
+    etag, last_modified = page_validators(request, versions, per_user)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        response = set_validators(response, etag, last_modified)
+    return response, etag, last_modified
+
+
+def set_validators(response, etag, last_modified):
+    """Проставляет валидаторы в ответ 200 или 304."""
+    if response.status_code not in (200, 304):
+        return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Браузер и прокси обязаны переспрашивать: сброс версии должен
+    # доходить до них сразу, а повторный запрос обходится в ответ 304.
+    del response['Expires']
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return response
+
+
+def _lookup(request, namespaces, view, args, kwargs, per_user=True):
+    """Ответ 304 или страница из кэша, а также middleware для записи."""
+    versions = get_versions(namespaces(request, *args, **kwargs))
+    response, etag, last_modified = check_not_modified(
+        request, versions, per_user
+    )
+    middleware = CacheMiddleware(
+        view,
+        page_timeout=settings.PAGE_CACHE_TIMEOUT,
+        key_prefix='page.' + '.'.join(versions),
+    )
+    if response is None:
+        response = middleware.process_request(request)
+    return response, middleware, (etag, last_modified), versions
+
+
+def _render_lock(request, middleware):
+    return _single_flight('render:' + md5(
+        '{}:{}:{}'.format(
+            middleware.key_prefix,
+            request.build_absolute_uri(),
+            request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+        ).encode(),
+        usedforsecurity=False,
+    ).hexdigest())
+
+
+def cache_page_versioned(namespaces, per_user=True):
+    """Аналог cache_page, у которого префикс ключа — версии namespaces.
+
+    ``namespaces`` получает аргументы представления и возвращает список
+    пространств имён, от которых зависит страница. При промахе страницу
+    строит один процесс, остальные дожидаются его результата в кэше.
+    Ответ несёт ETag и Last-Modified, повторный запрос получает 304.
+    ``per_user=False`` — для ответов, одинаковых для всех посетителей.
+    Страница строится только по репликам, где уже есть записи, сбросившие
+    её версии, иначе по основной базе.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response, middleware, validators, versions = _lookup(
+                request, namespaces, view, args, kwargs, per_user
+            )
+            if response is None:
+                with _render_lock(request, middleware):
+                    response = middleware.process_request(request)
+                    if response is None:
+                        with routers.only_replicas(fresh_replicas(versions)):
+                            response = view(request, *args, **kwargs)
+                        response = middleware.process_response(
+                            request, response)
+            return set_validators(response, *validators)
+        return wrapper
+    return decorator
+
+
+def acache_page_versioned(namespaces):
+    """cache_page_versioned для асинхронных представлений.
+
+    Обращения к кэшу и сессии уходят в поток, само представление
+    выполняется в цикле событий.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            response, middleware, validators, versions = await sync_to_async(
+                _lookup
+            )(request, namespaces, view, args, kwargs)
+            if response is None:
+                lock = _render_lock(request, middleware)
+                await sync_to_async(lock.__enter__)()
+                try:
+                    response = await sync_to_async(
+                        middleware.process_request
+                    )(request)
+                    if response is None:
+                        aliases = await sync_to_async(fresh_replicas)(
+                            versions)
+                        with routers.only_replicas(aliases):
+                            response = await view(request, *args, **kwargs)
+                        response = await sync_to_async(
+                            middleware.process_response
+                        )(request, response)
+                finally:
+                    await sync_to_async(lock.__exit__)(None, None, None)
+            return set_validators(response, *validators)
+        return wrapper
+    return decorator
+
+
+def warm(paths):
+    """Запрашивает страницы у запущенного сервера анонимно, чтобы они
+    попали в кэш.
+
+    Вызывается задачей воркера: запрос проходит через все middleware
+    настоящего сервера, поэтому ключ кэша и заголовки Vary совпадают
+    с ключом анонимного посетителя.
+    """
+    for path in paths:
+        request = Request(
+            urljoin(settings.PAGE_CACHE_WARM_URL, path),
+            headers={'Host': settings.PAGE_CACHE_WARM_HOST},
+        )
+        try:
+            with urlopen(request, timeout=settings.PAGE_CACHE_WARM_TIMEOUT):
+                pass
+        except HTTPError:
+            # Страницу успели удалить — прогревать нечего.
+            continue
@@ -0,0 +1,233 @@
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Comment, Follow, Group, GroupAuthorStats, GroupStats, Post, ProfileStats,
+    User,
+)
+
+
+def _count(queryset, field):
+    """Коррелированный подзапрос COUNT(*) по полю field."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0,
+    )
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_stats(user_id, field, delta):
+    stats = ProfileStats.objects.filter(user_id=user_id)
+    if not _change(stats, field, delta) and delta > 0 and not stats.exists():
+        recount_user(user_id)
+
+
+def change_comments(post_id, delta):
+    _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def recount_user(user_id):
+    stats = User.objects.filter(pk=user_id).annotate(
+        posts_total=_count(Post.objects, 'author'),
+        followers_total=_count(Follow.objects, 'author'),
+        following_total=_count(Follow.objects, 'user'),
+    ).values('posts_total', 'followers_total', 'following_total').first()
+    if stats is None:
+        return None
+    return ProfileStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': stats['posts_total'],
+            'followers_count': stats['followers_total'],
+            'following_count': stats['following_total'],
+        },
+    )[0]
+
+
+def get_stats(user):
+    try:
+        return user.stats
+    except ObjectDoesNotExist:
+        return recount_user(user.pk)
+
+
+def recount_users(user_ids=None):
+    """Пересчитывает сводки профилей; возвращает число исправленных."""
+    users = User.objects.filter(stats__isnull=True)
+    stats = ProfileStats.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+        stats = stats.filter(user_id__in=user_ids)
+    ProfileStats.objects.bulk_create(
+        [
+            ProfileStats(user_id=user_id)
+            for user_id in users.values_list('pk', flat=True).iterator()
+        ],
+        ignore_conflicts=True,
+    )
+    posts = _count(Post.objects, 'author')
+    followers = _count(Follow.objects, 'author')
+    following = _count(Follow.objects, 'user')
+    return stats.annotate(
+        posts_total=posts,
+        followers_total=followers,
+        following_total=following,
+    ).exclude(
+        posts_count=F('posts_total'),
+        followers_count=F('followers_total'),
+        following_count=F('following_total'),
+    ).update(
+        posts_count=posts,
+        followers_count=followers,
+        following_count=following,
+    )
+
+
+def recount_comments(post_ids=None):
+    """Пересчитывает comments_count; возвращает число исправленных постов."""
+    posts = Post.objects.all()
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+    comments = _count(Comment.objects, 'post')
+    return posts.annotate(
+        comments_total=comments
+    ).exclude(
+        comments_count=F('comments_total')
+    ).update(comments_count=comments)
+
+
+def recount_all():
+    """Пересчитывает все счётчики; возвращает число исправленных строк."""
+    return recount_users() + recount_comments() + recount_groups()
+
+
+def top_authors(group_id):
+    """Первые GROUP_TOP_AUTHORS авторов группы по индексу счётчиков."""
+    rows = GroupAuthorStats.objects.filter(
+        group_id=group_id, posts_count__gt=0,
+    ).order_by('-posts_count', 'author').values_list(
+        'author__username', 'posts_count',
+    )[:settings.GROUP_TOP_AUTHORS]
+    return [
+        {'username': username, 'posts_count': count}
+        for username, count in rows
+    ]
+
+
+def change_group(group_id, author_id, pub_date, delta):
+    """Пост автора появился в группе (delta=1) или ушёл из неё (-1).
+
+    Обновляются только строки этой группы, без GROUP BY по постам.
+    """
+    if group_id is None:
+        return
+    stats = GroupStats.objects.filter(group_id=group_id)
+    if not stats.exists():
+        recount_groups([group_id])
+        return
+    authors = GroupAuthorStats.objects.filter(
+        group_id=group_id, author_id=author_id)
+    if not _change(authors, 'posts_count', delta) and delta > 0:
+        _, created = authors.get_or_create(
+            group_id=group_id, author_id=author_id,
+            defaults={'posts_count': delta},
+        )
+        if not created:
+            _change(authors, 'posts_count', delta)
+    authors.filter(posts_count=0).delete()
+    _change(stats, 'posts_count', delta)
+    if delta > 0:
+        stats.filter(
+            Q(last_post_at__isnull=True) | Q(last_post_at__lt=pub_date)
+        ).update(last_post_at=pub_date)
+    else:
+        # Ушёл последний пост — берём следующий по индексу группы.
+        stats.filter(last_post_at__lte=pub_date).update(
+            last_post_at=Subquery(
+                Post.objects.filter(group_id=group_id).order_by(
+                    '-pub_date', '-id'
+                ).values('pub_date')[:1]
+            )
+        )
+    stats.update(top_authors=top_authors(group_id))
+
+
+def recount_groups(group_ids=None):
+    """Пересобирает сводки групп; возвращает число исправленных групп."""
+    groups = Group.objects.all()
+    posts = Post.objects.filter(group__isnull=False)
+    authors = GroupAuthorStats.objects.all()
+    stats = GroupStats.objects.all()
+    if group_ids is not None:
+        groups = groups.filter(pk__in=group_ids)
+        posts = posts.filter(group_id__in=group_ids)
+        authors = authors.filter(group_id__in=group_ids)
+        stats = stats.filter(group_id__in=group_ids)
+    totals = {}
+    rows = posts.order_by().values('group_id', 'author_id').annotate(
+        total=Count('pk'), last=Max('pub_date'),
+    )
+    for row in rows.iterator():
+        total = totals.setdefault(
+            row['group_id'], {'count': 0, 'last': None, 'authors': []})
+        total['count'] += row['total']
+        if total['last'] is None or row['last'] > total['last']:
+            total['last'] = row['last']
+        total['authors'].append((-row['total'], row['author_id']))
+    authors.delete()
+    GroupAuthorStats.objects.bulk_create(
+        [
+            GroupAuthorStats(
+                group_id=group_id, author_id=author_id, posts_count=-count)
+            for group_id, total in totals.items()
+            for count, author_id in total['authors']
+        ],
+        batch_size=settings.FEED_BATCH_SIZE,
+    )
+    top = {}
+    for group_id, total in totals.items():
+        top[group_id] = sorted(
+            total['authors'])[:settings.GROUP_TOP_AUTHORS]
+    usernames = dict(User.objects.filter(pk__in={
+        author_id for rows in top.values() for _, author_id in rows
+    }).values_list('pk', 'username'))
+    existing = stats.in_bulk()
+    missing, changed = [], []
+    for group_id in groups.values_list('pk', flat=True).iterator():
+        total = totals.get(group_id, {'count': 0, 'last': None})
+        fresh = GroupStats(
+            group_id=group_id,
+            posts_count=total['count'],
+            last_post_at=total['last'],
+            top_authors=[
+                {'username': usernames[author_id], 'posts_count': -count}
+                for count, author_id in top.get(group_id, ())
+            ],
+        )
+        current = existing.get(group_id)
+        if current is None:
+            missing.append(fresh)
+        elif (current.posts_count, current.last_post_at,
+              current.top_authors) != (fresh.posts_count, fresh.last_post_at,
+                                       fresh.top_authors):
+            changed.append(fresh)
+    GroupStats.objects.bulk_create(
+        missing, batch_size=settings.FEED_BATCH_SIZE, ignore_conflicts=True)
+    GroupStats.objects.bulk_update(
+        changed, ('posts_count', 'last_post_at', 'top_authors'),
+        batch_size=settings.FEED_BATCH_SIZE,
+    )
+    return len(missing) + len(changed)
@@ -0,0 +1,160 @@
+"""Потоковая выгрузка постов с комментариями.
+
+Записи совпадают с форматом manage.py import_posts: пост, затем его
+комментарии со ссылкой post_ref. Посты читаются пачками по ключу id,
+поэтому память не зависит от объёма выгрузки.
+"""
+import csv
+import json
+import zipfile
+
+from django.core.files.storage import default_storage
+
+from .models import Comment
+
+CHUNK_SIZE = 500
+FILE_CHUNK_SIZE = 64 * 1024
+CSV_FIELDS = (
+    'type', 'ref', 'post_ref', 'author', 'group', 'text', 'pub_date',
+    'created', 'image',
+)
+FORMATS = {
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'zip': ('application/zip', 'zip'),
+}
+
+
+def iter_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """Пачки объектов queryset в порядке id; каждая — отдельный запрос."""
+    last_pk = 0
+    while True:
+        chunk = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk')[:chunk_size]
+            .iterator(chunk_size=chunk_size)
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def iter_records(posts, chunk_size=CHUNK_SIZE):
+    posts = posts.select_related('author', 'group').only(
+        'text', 'pub_date', 'image', 'author__username', 'group__slug',
+    )
+    for chunk in iter_chunks(posts, chunk_size):
+        comments = Comment.objects.filter(
+            post__in=[post.pk for post in chunk]
+        ).select_related('author').only(
+            'post_id', 'text', 'created', 'author__username',
+        ).order_by('post', 'created', 'id')
+        by_post = {}
+        for comment in comments.iterator(chunk_size=chunk_size):
+            by_post.setdefault(comment.post_id, []).append(comment)
+        for post in chunk:
+            yield {
+                'type': 'post',
+                'ref': post.pk,
+                'author': post.author.username,
+                'group': post.group.slug if post.group else None,
+                'text': post.text,
+                'pub_date': post.pub_date.isoformat(),
+                'image': post.image.name or None,
+            }
+            for comment in by_post.get(post.pk, ()):
+                yield {
+                    'type': 'comment',
+                    'post_ref': post.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.DictWriter(_Echo(), CSV_FIELDS)
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+class _Sink:
+    """Файл только для записи: zipfile пишет в него, генератор забирает."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def zip_chunks(posts, chunk_size=CHUNK_SIZE, images=True):
+    """Архив с posts.jsonl и картинками постов, собираемый на лету.
+
+    Картинки добавляются вторым проходом по постам, чтобы не держать
+    их список в памяти.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open('posts.jsonl', 'w', force_zip64=True) as entry:
+            for line in jsonl_lines(iter_records(posts, chunk_size)):
+                entry.write(line.encode())
+                if sink.parts:
+                    yield sink.drain()
+        yield sink.drain()
+        if images:
+            with_images = posts.exclude(image='').only('image')
+            for chunk in iter_chunks(with_images, chunk_size):
+                for post in chunk:
+                    yield from _zip_file(archive, sink, post.image.name)
+    yield sink.drain()
+
+
+def _zip_file(archive, sink, name):
+    try:
+        source = default_storage.open(name, 'rb')
+    except (FileNotFoundError, OSError):
+        return
+    with source, archive.open(
+        f'images/{name}', 'w', force_zip64=True
+    ) as entry:
+        while True:
+            data = source.read(FILE_CHUNK_SIZE)
+            if not data:
+                break
+            entry.write(data)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def export_chunks(posts, file_format, chunk_size=CHUNK_SIZE):
+    """Выгрузка в формате jsonl, csv или zip (с картинками)."""
+    if file_format == 'zip':
+        return zip_chunks(posts, chunk_size)
+    lines = csv_lines if file_format == 'csv' else jsonl_lines
+    return lines(iter_records(posts, chunk_size))
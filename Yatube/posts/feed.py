@@ -0,0 +1,221 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Q
+
+from . import cache
+from .models import FeedEntry, Follow, Post, ProfileStats
+from .utils import POSTS_ORDERING, paginator_fun
+
+FEED_ORDERING = ('-pub_date', '-post_id')
+
+
+def is_big_author(author_id):
+    return ProfileStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_THRESHOLD,
+    ).exists()
+
+
+def big_authors_followed(user):
+    """Авторы из подписок пользователя, чьи посты читаются при запросе.
+
+    {id: username} по именам. Результат запоминается на объекте
+    пользователя: страница подписок нужна и для ключа кэша, и для ленты.
+    """
+    authors = getattr(user, '_big_authors', None)
+    if authors is None:
+        authors = user._big_authors = dict(Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gt=settings.FEED_FANOUT_THRESHOLD,
+        ).order_by('author__username').values_list(
+            'author', 'author__username'
+        ))
+    return authors
+
+
+def follow_namespaces(user):
+    """Пространства имён страницы подписок.
+
+    Посты мелких авторов попадают в ленту раскладкой, и она сбрасывает
+    follow_namespace подписчика. Посты крупных читаются при запросе,
+    поэтому страница зависит ещё от версий их профилей: публикация
+    крупного автора не перебирает его подписчиков.
+    """
+    return [
+        cache.follow_namespace(user.pk),
+        *(
+            cache.profile_namespace(username)
+            for username in big_authors_followed(user).values()
+        ),
+    ]
+
+
+def small_author_followers(author_id):
+    """Подписчики мелкого автора, чьи ленты хранят его посты; у крупного
+    автора — пустой список."""
+    if is_big_author(author_id):
+        return []
+    return list(Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True))
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Возвращает id подписчиков, в чьи ленты попал пост.
+    """
+    followers = small_author_followers(post.author_id)
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers
+        ],
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return followers
+
+
+def fan_out_many(posts):
+    """fan_out для пачки постов: подписчики читаются одним запросом.
+
+    Возвращает id пользователей, в чьи ленты попали посты.
+    """
+    authors = {post.author_id for post in posts}
+    big = set(ProfileStats.objects.filter(
+        user_id__in=authors,
+        followers_count__gt=settings.FEED_FANOUT_THRESHOLD,
+    ).values_list('user_id', flat=True))
+    followers = defaultdict(list)
+    follows = Follow.objects.filter(
+        author_id__in=authors - big
+    ).values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        followers[author_id].append(user_id)
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for post in posts
+            for user_id in followers[post.author_id]
+        ],
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return {user_id for users in followers.values() for user_id in users}
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика уже опубликованные посты."""
+    if is_big_author(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts.iterator()
+        ],
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_followers(author_id):
+    """Раскладывает посты автора по лентам всех его подписчиков.
+
+    Нужна, когда число подписчиков крупного автора опускается до
+    FEED_FANOUT_THRESHOLD: его посты снова читаются только из FeedEntry,
+    а записей для них не было. Возвращает id подписчиков.
+    """
+    followers = small_author_followers(author_id)
+    posts = list(Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')) if followers else []
+    for user_id in followers:
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(
+                    user_id=user_id,
+                    post_id=post_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for post_id, pub_date in posts
+            ],
+            batch_size=settings.FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+    return followers
+
+
+def trim(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild():
+    """Заново собирает все ленты по подпискам, например после bulk_create."""
+    FeedEntry.objects.all().delete()
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
+
+
+def follow_page(request):
+    """Страница ленты подписок.
+
+    Если пользователь не подписан на крупных авторов, страница читается
+    одним проходом по индексу ленты; иначе материализованная лента
+    объединяется с постами крупных авторов.
+    """
+    user = request.user
+    big_authors = big_authors_followed(user)
+    if not big_authors:
+        entries = FeedEntry.objects.filter(user=user).only('pub_date', 'post')
+        page_obj = paginator_fun(entries, request, FEED_ORDERING)
+        posts = Post.objects.for_listing().order_by().in_bulk(
+            [entry.post_id for entry in page_obj]
+        )
+        page_obj.object_list = [
+            posts[entry.post_id] for entry in page_obj
+            if entry.post_id in posts
+        ]
+        return page_obj
+    posts = Post.objects.for_listing().filter(
+        Q(pk__in=FeedEntry.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=list(big_authors))
+    )
+    return paginator_fun(posts, request)
+
+
+def latest(user, limit):
+    """Последние limit постов ленты подписок, как первая страница
+    follow_page, но без запроса страницы."""
+    big_authors = big_authors_followed(user)
+    if not big_authors:
+        post_ids = list(FeedEntry.objects.filter(user=user).order_by(
+            *FEED_ORDERING
+        ).values_list('post_id', flat=True)[:limit])
+        posts = Post.objects.for_listing().order_by().in_bulk(post_ids)
+        return [posts[pk] for pk in post_ids if pk in posts]
+    return list(Post.objects.for_listing().filter(
+        Q(pk__in=FeedEntry.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=list(big_authors))
+    ).order_by(*POSTS_ORDERING)[:limit])
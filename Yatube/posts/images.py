@@ -0,0 +1,66 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+RENDITIONS_DIR = 'posts/renditions'
+FORMATS = (
+    ('', 'JPEG', 'jpg'),
+    ('_webp', 'WEBP', 'webp'),
+)
+
+
+def renditions_dir(post):
+    return f'{RENDITIONS_DIR}/{post.pk}'
+
+
+def _clear(post):
+    directory = renditions_dir(post)
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        default_storage.delete(f'{directory}/{name}')
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=settings.POST_IMAGE_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def build_renditions(post):
+    """Нарезает картинку поста в фиксированные размеры и форматы.
+
+    Возвращает словарь «имя → URL» для шаблонов; исходник читается один раз.
+    """
+    _clear(post)
+    if not post.image:
+        return {}
+    try:
+        with post.image.open('rb') as source:
+            original = Image.open(source)
+            original.seek(0)
+            original = ImageOps.exif_transpose(original).convert('RGB')
+    except (OSError, UnidentifiedImageError):
+        return {}
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    renditions = {}
+    for name, size in settings.POST_IMAGE_RENDITIONS.items():
+        image = ImageOps.fit(original, size, Image.LANCZOS)
+        for suffix, image_format, extension in FORMATS:
+            path = default_storage.save(
+                f'{renditions_dir(post)}/{stem}_{name}.{extension}',
+                _encode(image, image_format),
+            )
+            renditions[f'{name}{suffix}'] = default_storage.url(path)
+    return renditions
+
+
+def render_post_image(post):
+    post.renditions = build_renditions(post)
+    post.save(update_fields=['renditions', 'updated_at'])
@@ -0,0 +1,83 @@
+"""Пакетная загрузка связанных данных на время запроса.
+
+Код сначала сообщает загрузчику все ключи, которые понадобятся (want),
+а первое обращение за значением забирает их одним IN-запросом, как
+DataLoader. Повторные обращения к тем же ключам в запросе бесплатны.
+"""
+from .models import Follow, Group, Post, ProfileStats, User
+
+USER_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_FIELDS = ('slug', 'title')
+POST_FIELDS = (
+    'text', 'pub_date', 'updated_at', 'image', 'comments_count', 'author',
+    'group',
+)
+
+
+class BatchLoader:
+    def __init__(self, fetch):
+        self.fetch = fetch
+        self.values = {}
+        self.pending = set()
+
+    def want(self, keys):
+        self.pending.update(
+            key for key in keys
+            if key is not None and key not in self.values
+        )
+
+    def dispatch(self):
+        if not self.pending:
+            return
+        keys, self.pending = self.pending, set()
+        found = self.fetch(sorted(keys))
+        for key in keys:
+            self.values[key] = found.get(key)
+
+    def get(self, key, default=None):
+        if key is None:
+            return default
+        if key not in self.values:
+            self.pending.add(key)
+            self.dispatch()
+        value = self.values[key]
+        return default if value is None else value
+
+    def get_many(self, keys):
+        """Значения по ключам одним запросом; отсутствующие — None."""
+        keys = list(keys)
+        self.want(keys)
+        self.dispatch()
+        return {key: self.values.get(key) for key in keys}
+
+
+class Loader:
+    """Загрузчики постов, авторов, групп, счётчиков и подписок запроса."""
+
+    def __init__(self, user=None):
+        self.user = user
+        self.posts = BatchLoader(
+            lambda ids: Post.objects.only(*POST_FIELDS).in_bulk(ids))
+        self.users = BatchLoader(
+            lambda ids: User.objects.only(*USER_FIELDS).in_bulk(ids))
+        self.groups = BatchLoader(
+            lambda ids: Group.objects.only(*GROUP_FIELDS).in_bulk(ids))
+        self.posts_counts = BatchLoader(lambda ids: dict(
+            ProfileStats.objects.filter(user_id__in=ids).values_list(
+                'user_id', 'posts_count')))
+        self.following = BatchLoader(self.fetch_following)
+
+    def fetch_following(self, author_ids):
+        if self.user is None or not self.user.is_authenticated:
+            return {}
+        return dict.fromkeys(Follow.objects.filter(
+            user=self.user, author_id__in=author_ids,
+        ).values_list('author_id', flat=True), True)
+
+
+def get_loader(request):
+    """Загрузчик, общий для всего запроса."""
+    loader = getattr(request, '_loader', None)
+    if loader is None:
+        loader = request._loader = Loader(request.user)
+    return loader
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import CHUNK_SIZE, FORMATS, export_chunks
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты автора или группы с комментариями в JSONL, CSV '
+        'или zip с картинками; формат совместим с import_posts'
+    )
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--author', help='Имя пользователя')
+        source.add_argument('--group', help='Slug группы')
+        parser.add_argument(
+            '--format', choices=tuple(FORMATS), default='jsonl')
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='Файл или «-» для stdout (zip — только в файл)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['author']:
+            author = User.objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError('Нет такого пользователя')
+            posts = Post.objects.filter(author=author)
+        else:
+            group = Group.objects.filter(slug=options['group']).first()
+            if group is None:
+                raise CommandError('Нет такой группы')
+            posts = Post.objects.filter(group=group)
+        file_format, path = options['format'], options['output']
+        chunks = export_chunks(posts, file_format, options['chunk_size'])
+        if file_format == 'zip':
+            if path == '-':
+                raise CommandError('Zip выгружается только в файл: --output')
+            with open(path, 'wb') as file:
+                for chunk in chunks:
+                    file.write(chunk)
+            return
+        if path == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            for chunk in chunks:
+                file.write(chunk)
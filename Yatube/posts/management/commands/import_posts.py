@@ -0,0 +1,320 @@
+import csv
+import json
+import sys
+import time
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import cache, feed, popular
+from posts.bulk import batched, explicit_dates
+from posts.counters import recount_comments, recount_groups, recount_users
+from posts.models import Comment, Follow, Group, Post, User
+from posts.search import get_backend
+
+POST, COMMENT, FOLLOW = 'post', 'comment', 'follow'
+KINDS = (POST, COMMENT, FOLLOW)
+INVALID = 'invalid'
+
+
+def read_jsonl(stream, invalid):
+    """Записи JSONL; о строках, которые не JSON-объект, сообщает invalid."""
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as error:
+            invalid(number, error.msg)
+            continue
+        if not isinstance(record, dict):
+            invalid(number, 'ожидался объект')
+            continue
+        yield record
+
+
+def read_csv(stream):
+    for record in csv.DictReader(stream):
+        yield {key: value or None for key, value in record.items()}
+
+
+def parse_date(value, default):
+    if not value:
+        return default
+    date = parse_datetime(value)
+    if date is None:
+        return default
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+class Importer:
+    """Копит записи по видам и сохраняет их пачками через bulk_create.
+
+    Сигналы при bulk_create не срабатывают, поэтому поисковый индекс и
+    ленты пополняются для каждой пачки, счётчики затронутых профилей,
+    постов и групп и популярность пересчитываются в конце, а кэш страниц
+    сбрасывается по затронутым пространствам имён.
+    """
+
+    def __init__(self, batch_size, create_missing):
+        self.batch_size = batch_size
+        self.create_missing = create_missing
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.refs = {}
+        self.pending = {kind: [] for kind in KINDS}
+        self.imported = Counter()
+        self.skipped = Counter()
+        self.namespaces = set()
+        self.user_ids = set()
+        self.post_ids = set()
+        self.group_ids = set()
+
+    def add(self, record, default_kind):
+        kind = record.get('type') or default_kind
+        if kind not in KINDS:
+            self.skipped[kind or 'unknown'] += 1
+            return
+        self.pending[kind].append(record)
+        if len(self.pending[kind]) >= self.batch_size:
+            self.flush(kind)
+
+    def flush(self, kind):
+        if kind == COMMENT:
+            # Комментарии могут ссылаться на ref постов из этого же файла.
+            self.flush(POST)
+        records, self.pending[kind] = self.pending[kind], []
+        if records:
+            with transaction.atomic():
+                getattr(self, f'import_{kind}s')(records)
+
+    def finish(self):
+        for kind in KINDS:
+            self.flush(kind)
+        recount_users(self.user_ids)
+        recount_comments(self.post_ids)
+        recount_groups(self.group_ids)
+        popular.rebuild()
+        self.namespaces.update((cache.POPULAR, cache.GROUPS))
+        cache.bump(*self.namespaces)
+
+    def resolve_users(self, usernames):
+        missing = {name for name in usernames if name} - set(self.users)
+        if not missing or not self.create_missing:
+            return
+        User.objects.bulk_create(
+            [User(username=name, password=make_password(None))
+             for name in missing],
+            ignore_conflicts=True,
+        )
+        self.users.update(User.objects.filter(
+            username__in=missing).values_list('username', 'pk'))
+
+    def resolve_groups(self, slugs):
+        missing = {slug for slug in slugs if slug} - set(self.groups)
+        if not missing or not self.create_missing:
+            return
+        Group.objects.bulk_create(
+            [Group(slug=slug, title=slug) for slug in missing],
+            ignore_conflicts=True,
+        )
+        self.groups.update(Group.objects.filter(
+            slug__in=missing).values_list('slug', 'pk'))
+
+    def import_posts(self, records):
+        self.resolve_users(record.get('author') for record in records)
+        self.resolve_groups(record.get('group') for record in records)
+        now = timezone.now()
+        posts, refs = [], []
+        for record in records:
+            author_id = self.users.get(record.get('author'))
+            slug = record.get('group')
+            group_id = self.groups.get(slug) if slug else None
+            if not record.get('text') or author_id is None or (
+                    slug and group_id is None):
+                self.skipped[POST] += 1
+                continue
+            pub_date = parse_date(record.get('pub_date'), now)
+            posts.append(Post(
+                author_id=author_id,
+                group_id=group_id,
+                text=record['text'],
+                pub_date=pub_date,
+                updated_at=pub_date,
+            ))
+            refs.append(record.get('ref'))
+            self.namespaces.add(cache.profile_namespace(record['author']))
+            if slug:
+                self.namespaces.add(cache.group_namespace(slug))
+        with explicit_dates(Post):
+            Post.objects.bulk_create(posts)
+        if posts and posts[0].pk is None:
+            raise CommandError(
+                'СУБД не возвращает id после bulk_create: импорт постов '
+                'без них не может обновить ленты и поиск')
+        for ref, post in zip(refs, posts):
+            if ref is not None:
+                self.refs[str(ref)] = post.pk
+        self.user_ids.update(post.author_id for post in posts)
+        self.group_ids.update(
+            post.group_id for post in posts if post.group_id)
+        get_backend().index_many(posts)
+        for user_id in feed.fan_out_many(posts):
+            self.namespaces.add(cache.follow_namespace(user_id))
+        self.namespaces.add(cache.INDEX)
+        self.imported[POST] += len(posts)
+
+    def import_comments(self, records):
+        self.resolve_users(record.get('author') for record in records)
+        post_ids = []
+        for record in records:
+            ref = record.get('post_ref')
+            post_id = self.refs.get(str(ref)) if ref else record.get('post')
+            try:
+                post_ids.append(int(post_id))
+            except (TypeError, ValueError):
+                post_ids.append(None)
+        posts = {
+            pk: (author_id, username, slug)
+            for pk, author_id, username, slug in Post.objects.filter(
+                pk__in={pk for pk in post_ids if pk is not None}
+            ).values_list('pk', 'author_id', 'author__username',
+                          'group__slug')
+        }
+        now = timezone.now()
+        comments = []
+        for record, post_id in zip(records, post_ids):
+            author_id = self.users.get(record.get('author'))
+            if not record.get('text') or author_id is None or (
+                    post_id not in posts):
+                self.skipped[COMMENT] += 1
+                continue
+            comments.append(Comment(
+                post_id=post_id,
+                author_id=author_id,
+                text=record['text'],
+                created=parse_date(record.get('created'), now),
+            ))
+        with explicit_dates(Comment):
+            Comment.objects.bulk_create(comments)
+        touched = {comment.post_id for comment in comments}
+        self.post_ids |= touched
+        for post_id in touched:
+            _, username, slug = posts[post_id]
+            self.namespaces.add(cache.post_namespace(post_id))
+            self.namespaces.add(cache.profile_namespace(username))
+            if slug:
+                self.namespaces.add(cache.group_namespace(slug))
+        followers = Follow.objects.filter(
+            author_id__in={posts[post_id][0] for post_id in touched}
+        ).values_list('user_id', flat=True).distinct()
+        for user_id in followers.iterator():
+            self.namespaces.add(cache.follow_namespace(user_id))
+        if comments:
+            self.namespaces.add(cache.INDEX)
+        self.imported[COMMENT] += len(comments)
+
+    def import_follows(self, records):
+        self.resolve_users(
+            name for record in records
+            for name in (record.get('user'), record.get('author'))
+        )
+        pairs = {}
+        for record in records:
+            user_id = self.users.get(record.get('user'))
+            author_id = self.users.get(record.get('author'))
+            if user_id is None or author_id is None or user_id == author_id:
+                self.skipped[FOLLOW] += 1
+                continue
+            pairs[user_id, author_id] = record['author']
+        Follow.objects.bulk_create(
+            [Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in pairs],
+            ignore_conflicts=True,
+        )
+        for (user_id, author_id), username in pairs.items():
+            self.user_ids.update((user_id, author_id))
+            feed.backfill(user_id, author_id)
+            self.namespaces.add(cache.follow_namespace(user_id))
+            self.namespaces.add(cache.profile_namespace(username))
+        self.imported[FOLLOW] += len(pairs)
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты, комментарии и подписки из JSONL или CSV '
+        'пачками через bulk_create'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или «-» для stdin')
+        parser.add_argument(
+            '--format',
+            choices=('jsonl', 'csv'),
+            help='По умолчанию определяется по расширению файла',
+        )
+        parser.add_argument(
+            '--kind',
+            choices=KINDS,
+            default=POST,
+            help='Вид записей без поля type (для CSV — всех записей)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--create-missing',
+            action='store_true',
+            help='Создавать неизвестных пользователей и группы',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        importer = Importer(options['batch_size'], options['create_missing'])
+
+        def invalid(number, reason):
+            importer.skipped[INVALID] += 1
+            self.stderr.write(f'Строка {number} пропущена: {reason}')
+
+        stream = sys.stdin if path == '-' else open(
+            path, encoding='utf-8', newline='')
+        records = read_csv(stream) if file_format == 'csv' else read_jsonl(
+            stream, invalid)
+        start = time.perf_counter()
+        rows = 0
+        try:
+            for batch in batched(records, options['batch_size']):
+                for record in batch:
+                    importer.add(record, options['kind'])
+                rows += len(batch)
+                if options['verbosity'] > 1:
+                    self.stdout.write(
+                        f'Прочитано {rows} строк, '
+                        f'{rows / (time.perf_counter() - start):.0f} строк/с'
+                    )
+            importer.finish()
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = time.perf_counter() - start
+        imported = importer.imported
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {imported[POST]}, '
+            f'комментариев: {imported[COMMENT]}, '
+            f'подписок: {imported[FOLLOW]} за {elapsed:.1f} с '
+            f'({rows / elapsed if elapsed else 0:.0f} строк/с)'
+        ))
+        if importer.skipped:
+            self.stdout.write(self.style.WARNING(
+                'Пропущено: ' + ', '.join(
+                    f'{kind} — {count}'
+                    for kind, count in sorted(importer.skipped.items())
+                )
+            ))
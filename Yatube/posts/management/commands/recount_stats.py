@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import enqueue
+from posts.counters import recount_all
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='Поставить пересчёт в очередь задач',
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            enqueue('posts.recount_stats', key='recount_stats')
+            self.stdout.write(
+                self.style.SUCCESS('Пересчёт поставлен в очередь')
+            )
+            return
+        repaired = recount_all()
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено записей: {repaired}')
+        )
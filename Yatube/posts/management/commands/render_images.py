@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import render_post_image
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Нарезает готовые размеры картинок для постов без них'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать размеры для всех постов с картинками',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(renditions={})
+        rendered = 0
+        for post in posts.iterator():
+            render_post_image(post)
+            rendered += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано постов: {rendered}'))
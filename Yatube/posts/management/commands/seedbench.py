@@ -0,0 +1,133 @@
+import datetime
+import random
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import feed, popular
+from posts.bulk import explicit_dates
+from posts.counters import recount_all
+from posts.models import Comment, Follow, Group, Post, User
+from posts.search import get_backend
+
+PREFIX = 'bench'
+WORDS = (
+    'кот пёс утро вечер город лес река море дорога книга музыка кино '
+    'работа отпуск кофе чай дождь солнце снег ветер поезд самолёт '
+    'код сервер база запрос кэш очередь поиск лента подписка пост'
+).split()
+
+
+def zipf_weights(size, exponent):
+    """Веса «длинного хвоста»: первые элементы выбираются чаще всего."""
+    return [1 / (rank + 1) ** exponent for rank in range(size)]
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу данными для бенчмарка: пользователи, группы, посты, '
+        'комментарии и подписки с неравномерным распределением по авторам'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=2000)
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='Показатель распределения Ципфа для авторов и постов',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить данные предыдущего запуска',
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if options['clear']:
+            User.objects.filter(username__startswith=f'{PREFIX}-').delete()
+            Group.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+        start = User.objects.filter(
+            username__startswith=f'{PREFIX}-').count()
+        User.objects.bulk_create([
+            User(username=f'{PREFIX}-{start + number}')
+            for number in range(options['users'])
+        ])
+        users = list(User.objects.filter(
+            username__startswith=f'{PREFIX}-').order_by('pk'))
+        groups = [
+            Group.objects.get_or_create(
+                slug=f'{PREFIX}-{number}',
+                defaults={
+                    'title': f'Группа {number}',
+                    'description': sentence(rng, 12),
+                },
+            )[0]
+            for number in range(options['groups'])
+        ]
+        author_weights = zipf_weights(len(users), options['skew'])
+        now = timezone.now()
+        span = datetime.timedelta(days=options['days']).total_seconds()
+        posts = [
+            Post(
+                author=rng.choices(users, author_weights)[0],
+                group=rng.choice(groups + [None]),
+                text=sentence(rng, rng.randint(5, 60)),
+            )
+            for _ in range(options['posts'])
+        ]
+        for post in posts:
+            post.pub_date = post.updated_at = now - datetime.timedelta(
+                seconds=rng.uniform(0, span))
+        with explicit_dates(Post):
+            posts = Post.objects.bulk_create(posts, batch_size=1000)
+        if posts and posts[0].pk is None:
+            # СУБД без RETURNING не возвращает id вставленных строк.
+            posts = list(Post.objects.order_by('-pk')[:len(posts)])
+        post_weights = zipf_weights(len(posts), options['skew'])
+        rng.shuffle(post_weights)
+        comments = Comment.objects.bulk_create([
+            Comment(
+                post=rng.choices(posts, post_weights)[0],
+                author=rng.choice(users),
+                text=sentence(rng, rng.randint(3, 20)),
+            )
+            for _ in range(options['comments'])
+        ], batch_size=1000)
+        pairs = set()
+        for _ in range(options['follows']):
+            author = rng.choices(users, author_weights)[0]
+            user = rng.choice(users)
+            if user != author:
+                pairs.add((user.pk, author.pk))
+        Follow.objects.bulk_create(
+            [Follow(user_id=user, author_id=author) for user, author in pairs],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        # bulk_create не вызывает сигналы: счётчики, ленты и поисковый
+        # индекс пересобираются целиком.
+        recount_all()
+        feed.rebuild()
+        popular.rebuild()
+        get_backend().rebuild()
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(users)}, групп: {len(groups)}, '
+            f'постов: {len(posts)}, комментариев: {len(comments)}, '
+            f'подписок: {len(pairs)}'
+        ))
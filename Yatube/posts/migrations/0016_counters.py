@@ -0,0 +1,58 @@
+# Generated by Django 4.0.4 on 2026-10-18 04:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    ProfileStats = apps.get_model('posts', 'ProfileStats')
+    users = User.objects.annotate(
+        posts_total=Count('posts', distinct=True),
+        followers_total=Count('following', distinct=True),
+        following_total=Count('follower', distinct=True),
+    )
+    ProfileStats.objects.bulk_create(
+        [
+            ProfileStats(
+                user_id=user.pk,
+                posts_count=user.posts_total,
+                followers_count=user.followers_total,
+                following_count=user.following_total,
+            )
+            for user in users.iterator()
+        ],
+        batch_size=500,
+    )
+    posts = Post.objects.annotate(total=Count('comments')).filter(total__gt=0)
+    for post_id, total in posts.values_list('pk', 'total').iterator():
+        Post.objects.filter(pk=post_id).update(comments_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('posts', '0015_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Готовые размеры картинки'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+        'text, group_id UNINDEXED, author_id UNINDEXED, '
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f'INSERT INTO {FTS_TABLE} (rowid, text, group_id, author_id) '
+        'SELECT id, text, group_id, author_id FROM posts_post'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
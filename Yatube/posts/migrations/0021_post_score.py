@@ -0,0 +1,25 @@
+# Generated by Django 4.0.4 on 2026-10-18 05:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='posts.post')),
+                ('score', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='postscore',
+            index=models.Index(fields=['-score', '-post'], name='post_score_idx'),
+        ),
+    ]
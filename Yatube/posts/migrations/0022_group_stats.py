@@ -0,0 +1,92 @@
+# Generated by Django 4.0.4 on 2026-10-18 05:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def fill_group_stats(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    GroupAuthorStats = apps.get_model('posts', 'GroupAuthorStats')
+    rows = Post.objects.filter(group__isnull=False).order_by().values(
+        'group_id', 'author_id', 'author__username',
+    ).annotate(total=Count('pk'), last=Max('pub_date'))
+    stats = {
+        pk: GroupStats(group_id=pk)
+        for pk in Group.objects.values_list('pk', flat=True).iterator()
+    }
+    authors = []
+    for row in rows.iterator():
+        group = stats[row['group_id']]
+        group.posts_count += row['total']
+        if group.last_post_at is None or row['last'] > group.last_post_at:
+            group.last_post_at = row['last']
+        group.top_authors.append({
+            'username': row['author__username'],
+            'posts_count': row['total'],
+        })
+        authors.append(GroupAuthorStats(
+            group_id=row['group_id'],
+            author_id=row['author_id'],
+            posts_count=row['total'],
+        ))
+    for group in stats.values():
+        group.top_authors = sorted(
+            group.top_authors,
+            key=lambda author: -author['posts_count'],
+        )[:3]
+    GroupStats.objects.bulk_create(stats.values(), batch_size=500)
+    GroupAuthorStats.objects.bulk_create(authors, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0021_post_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupAuthorStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.group')),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('last_post_at', models.DateTimeField(blank=True, null=True)),
+                ('top_authors', models.JSONField(blank=True, default=list)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['title', 'id'], name='group_title_idx'),
+        ),
+        migrations.AddField(
+            model_name='groupauthorstats',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='groupauthorstats',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_stats', to='posts.group'),
+        ),
+        migrations.AddIndex(
+            model_name='groupauthorstats',
+            index=models.Index(fields=['group', '-posts_count', 'author'], name='group_author_count_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupauthorstats',
+            constraint=models.UniqueConstraint(fields=('group', 'author'), name='unique_group_author'),
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
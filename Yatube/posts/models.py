@@ -3,21 +3,52 @@ from django.db import models
 
 User = get_user_model()
 
+LISTING_FIELDS = (
+    'text',
+    'pub_date',
+    'updated_at',
+    'image',
+    'renditions',
+    'author',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group',
+    'group__title',
+    'group__slug',
+    'comments_count',
+)
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField(max_length=500)
 
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('title', 'id'),
+                name='group_title_idx',
+            ),
+        )
+
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Всё, что нужно карточке поста, одним запросом."""
+        return self.select_related('author', 'group').only(*LISTING_FIELDS)
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст',
                             help_text='Напишите ваш текст'
                             )
     pub_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -38,9 +69,36 @@ class Post(models.Model):
         blank=True,
         help_text='Загрузите свою картинку'
     )
+    renditions = models.JSONField(
+        'Готовые размеры картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:15]
@@ -67,6 +125,14 @@ class Comment(models.Model):
         auto_now_add=True,
     )
 
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('post', 'created', 'id'),
+                name='comment_post_created_idx',
+            ),
+        )
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -85,3 +151,118 @@ class Follow(models.Model):
                 fields=('user', 'author'),
                 name='unique_users',
             ),)
+        indexes = (
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx',
+            ),)
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_feed_entry',
+            ),)
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='feed_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_user_author_idx',
+            ),)
+
+
+class PostScore(models.Model):
+    """Популярность поста: растёт с публикацией и комментариями, затухает
+    периодической задачей posts.decay_scores."""
+
+    post = models.OneToOneField(
+        Post,
+        primary_key=True,
+        related_name='score',
+        on_delete=models.CASCADE,
+    )
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('-score', '-post'),
+                name='post_score_idx',
+            ),
+        )
+
+
+class ProfileStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE,
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class GroupStats(models.Model):
+    """Сводка группы для каталога: меняется вместе с постами группы."""
+
+    group = models.OneToOneField(
+        Group,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE,
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    last_post_at = models.DateTimeField(null=True, blank=True)
+    top_authors = models.JSONField(default=list, blank=True)
+
+
+class GroupAuthorStats(models.Model):
+    """Число постов автора в группе: из него берутся top_authors."""
+
+    group = models.ForeignKey(
+        Group,
+        related_name='author_stats',
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('group', 'author'),
+                name='unique_group_author',
+            ),)
+        indexes = (
+            models.Index(
+                fields=('group', '-posts_count', 'author'),
+                name='group_author_count_idx',
+            ),)
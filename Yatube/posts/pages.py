@@ -0,0 +1,121 @@
+"""Страницы чтения: пространства имён кэша, шаблон и контекст.
+
+Синхронные (views.py) и асинхронные (async_views.py) представления
+оборачивают одни и те же описания. Контекст собирается по шагам: load
+читает объект страницы, queries — независимые запросы, которые
+асинхронный вариант выполняет одновременно, finish дополняет контекст
+их результатами.
+"""
+from django.shortcuts import get_object_or_404
+
+from . import cache, popular, syndication
+from .counters import get_stats
+from .feed import follow_namespaces, follow_page
+from .forms import CommentForm
+from .models import Follow, Group, Post, User
+from .utils import comments_page, groups_page, paginator_fun
+
+
+class Page:
+    def __init__(self, template, namespaces, queries, load=None,
+                 finish=None, validators=None):
+        self.template = template
+        self.namespaces = namespaces
+        self.queries = queries
+        self.load = load or (lambda request, **kwargs: {})
+        self.finish = finish or (lambda context: context)
+        # Пространства имён для ETag страниц, которые не кэшируются
+        # целиком, а отвечают 304 по версиям.
+        self.validators = validators
+
+
+def is_following(user, author):
+    return user.is_authenticated and Follow.objects.filter(
+        user=user, author=author).exists()
+
+
+def load_post(request, post_id):
+    return {'post': get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        pk=post_id,
+    )}
+
+
+def with_posts_count(context):
+    context['posts_count'] = context['stats'].posts_count
+    return context
+
+
+index = Page(
+    'posts/index.html',
+    lambda request: [cache.INDEX],
+    lambda request, context: {
+        'page_obj': lambda: paginator_fun(
+            Post.objects.for_listing(), request),
+    },
+)
+
+popular_posts = Page(
+    'posts/popular.html',
+    lambda request: [cache.INDEX, cache.POPULAR],
+    lambda request, context: {'page_obj': popular.top_posts},
+)
+
+group_index = Page(
+    'posts/group_index.html',
+    lambda request: [cache.GROUPS],
+    lambda request, context: {'page_obj': lambda: groups_page(request)},
+)
+
+group_posts = Page(
+    'posts/group_list.html',
+    lambda request, slug: [cache.group_namespace(slug)],
+    lambda request, context: {
+        'page_obj': lambda: paginator_fun(
+            context['group'].posts.for_listing(), request),
+    },
+    load=lambda request, slug: {
+        'group': get_object_or_404(Group, slug=slug),
+    },
+)
+
+profile = Page(
+    'posts/profile.html',
+    lambda request, username: [cache.profile_namespace(username)],
+    lambda request, context: {
+        'page_obj': lambda: paginator_fun(
+            context['author'].posts.for_listing(), request),
+        'stats': lambda: get_stats(context['author']),
+        'following': lambda: is_following(request.user, context['author']),
+    },
+    load=lambda request, username: {
+        'author': get_object_or_404(
+            User.objects.select_related('stats'), username=username),
+    },
+    finish=with_posts_count,
+)
+
+post_detail = Page(
+    'posts/post_detail.html',
+    None,
+    lambda request, context: {
+        'stats': lambda: get_stats(context['post'].author),
+        'comments': lambda: comments_page(context['post'], request),
+    },
+    load=load_post,
+    finish=lambda context: with_posts_count(
+        {**context, 'comments_form': CommentForm()}),
+    validators=lambda context: [
+        cache.post_namespace(context['post'].pk),
+        cache.profile_namespace(context['post'].author.username),
+    ],
+)
+
+follow_index = Page(
+    'posts/follow.html',
+    lambda request: follow_namespaces(request.user),
+    lambda request, context: {
+        'page_obj': lambda: follow_page(request),
+        'feed_token': lambda: syndication.follow_token(request.user),
+    },
+)
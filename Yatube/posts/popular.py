@@ -0,0 +1,73 @@
+"""Популярные посты по таблице PostScore.
+
+Публикация и комментарий прибавляют к счёту поста вес, периодическая
+задача posts.decay_scores умножает все счета на множитель полураспада
+за время с прошлого запуска и удаляет остывшие. Вкладка читает первые
+POPULAR_SIZE строк по индексу, не агрегируя комментарии.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Comment, Post, PostScore
+
+
+def decay_factor(seconds):
+    return 0.5 ** (seconds / settings.POPULAR_HALF_LIFE)
+
+
+def add(post_id, weight):
+    updated = PostScore.objects.filter(post_id=post_id).update(
+        score=F('score') + weight)
+    if not updated:
+        PostScore.objects.get_or_create(
+            post_id=post_id, defaults={'score': weight})
+
+
+def decay(seconds):
+    """Затухание за seconds секунд."""
+    factor = decay_factor(seconds)
+    PostScore.objects.update(score=F('score') * factor)
+    PostScore.objects.filter(score__lt=settings.POPULAR_MIN_SCORE).delete()
+
+
+def top_ids(limit=None):
+    return list(PostScore.objects.order_by('-score', '-post').values_list(
+        'post_id', flat=True)[:limit or settings.POPULAR_SIZE])
+
+
+def top_posts(limit=None):
+    """Посты вкладки в порядке счёта: индекс PostScore, затем in_bulk."""
+    post_ids = top_ids(limit)
+    posts = Post.objects.for_listing().order_by().in_bulk(post_ids)
+    return [posts[pk] for pk in post_ids if pk in posts]
+
+
+def rebuild():
+    """Пересчёт с нуля по событиям за POPULAR_REBUILD_WINDOW полураспадов.
+
+    Нужен после seedbench, импорта и при первом запуске.
+    """
+    now = timezone.now()
+    since = now - datetime.timedelta(
+        seconds=settings.POPULAR_HALF_LIFE * settings.POPULAR_REBUILD_WINDOW)
+    scores = {}
+    posts = Post.objects.filter(pub_date__gte=since).values_list(
+        'pk', 'pub_date')
+    comments = Comment.objects.filter(created__gte=since).values_list(
+        'post_id', 'created')
+    for weight, rows in ((settings.POPULAR_POST_WEIGHT, posts),
+                         (settings.POPULAR_COMMENT_WEIGHT, comments)):
+        for post_id, date in rows.iterator():
+            age = (now - date).total_seconds()
+            scores[post_id] = scores.get(post_id, 0) + weight * decay_factor(
+                age)
+    PostScore.objects.all().delete()
+    PostScore.objects.bulk_create(
+        [PostScore(post_id=post_id, score=score)
+         for post_id, score in scores.items()
+         if score >= settings.POPULAR_MIN_SCORE],
+        batch_size=settings.FEED_BATCH_SIZE,
+    )
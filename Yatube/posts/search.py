@@ -0,0 +1,184 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Post
+from .utils import (BACKWARD, FORWARD, CursorPaginator, decode_cursor,
+                    encode_cursor)
+
+
+class BaseSearchBackend(ABC):
+    """Полнотекстовый индекс постов.
+
+    ``search`` возвращает id найденных постов страницы в порядке
+    релевантности и курсоры соседних страниц.
+    """
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def index_many(self, posts):
+        for post in posts:
+            self.index(post)
+
+    def rebuild(self):
+        """Переиндексирует все посты, например после bulk_create."""
+        for post in Post.objects.only(
+            'text', 'group', 'author'
+        ).iterator():
+            self.index(post)
+
+    @abstractmethod
+    def filter(self, queryset, query):
+        """Сужает queryset постов до совпадающих с query."""
+
+    @abstractmethod
+    def search(self, query, per_page, token=None, group_id=None,
+               author_id=None):
+        """Страница id постов по query и курсоры соседних страниц."""
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Запасной вариант для СУБД без полнотекстового индекса."""
+
+    def filter(self, queryset, query):
+        for word in query.split():
+            queryset = queryset.filter(text__icontains=word)
+        return queryset
+
+    def search(self, query, per_page, token=None, group_id=None,
+               author_id=None):
+        posts = self.filter(Post.objects.only('pub_date'), query)
+        if group_id is not None:
+            posts = posts.filter(group_id=group_id)
+        if author_id is not None:
+            posts = posts.filter(author_id=author_id)
+        rows, next_cursor, previous_cursor = CursorPaginator(
+            posts, per_page
+        ).get_rows(token)
+        return [post.pk for post in rows], next_cursor, previous_cursor
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Индекс FTS5: rowid строки индекса совпадает с id поста."""
+
+    table = 'posts_post_fts'
+
+    @staticmethod
+    def match_expression(query):
+        """Каждое слово ищется как фраза, чтобы ввод не ломал синтаксис."""
+        return ' '.join(
+            '"{}"'.format(word.replace('"', '""')) for word in query.split()
+        )
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text, group_id, author_id) '
+                'VALUES (%s, %s, %s, %s)',
+                [post.pk, post.text, post.group_id, post.author_id],
+            )
+
+    def index_many(self, posts):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [[post.pk] for post in posts],
+            )
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, text, group_id, author_id) '
+                'VALUES (%s, %s, %s, %s)',
+                [
+                    [post.pk, post.text, post.group_id, post.author_id]
+                    for post in posts
+                ],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post_id]
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text, group_id, author_id) '
+                'SELECT id, text, group_id, author_id '
+                f'FROM {Post._meta.db_table}'
+            )
+
+    def filter(self, queryset, query):
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+            [self.match_expression(query)],
+        ))
+
+    def search(self, query, per_page, token=None, group_id=None,
+               author_id=None):
+        match = self.match_expression(query)
+        if not match:
+            return [], None, None
+        cursor = decode_cursor(token, 2) if token else None
+        backward = cursor is not None and cursor[0] == BACKWARD
+        where, params = [], [match]
+        if group_id is not None:
+            where.append('group_id = %s')
+            params.append(group_id)
+        if author_id is not None:
+            where.append('author_id = %s')
+            params.append(author_id)
+        if cursor is not None:
+            try:
+                score, post_id = float(cursor[1][0]), int(cursor[1][1])
+            except (TypeError, ValueError):
+                return self.search(query, per_page, None, group_id, author_id)
+            sign = '<' if backward else '>'
+            where.append(
+                f'(score {sign} %s OR (score = %s AND id {sign} %s))'
+            )
+            params.extend([score, score, post_id])
+        direction = 'DESC' if backward else 'ASC'
+        sql = (
+            'SELECT id, score FROM ('
+            f'SELECT rowid AS id, bm25({self.table}) AS score, '
+            'group_id, author_id '
+            f'FROM {self.table} WHERE {self.table} MATCH %s'
+            ')'
+            + (' WHERE ' + ' AND '.join(where) if where else '')
+            + f' ORDER BY score {direction}, id {direction} LIMIT %s'
+        )
+        params.append(per_page + 1)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            rows = db_cursor.fetchall()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if backward:
+            if not rows:
+                return self.search(query, per_page, None, group_id, author_id)
+            rows.reverse()
+        has_next = True if backward else has_more
+        has_previous = has_more if backward else cursor is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(FORWARD, [rows[-1][1], rows[-1][0]])
+        if rows and has_previous:
+            previous_cursor = encode_cursor(BACKWARD, [rows[0][1], rows[0][0]])
+        return [post_id for post_id, _ in rows], next_cursor, previous_cursor
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.POSTS_SEARCH_BACKEND)()
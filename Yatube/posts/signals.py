@@ -0,0 +1,250 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.urls import reverse
+
+from core.jobs import enqueue
+
+from . import cache, counters, feed, popular
+from .models import (
+    Comment, Follow, Group, GroupStats, Post, ProfileStats, User,
+)
+from .search import get_backend
+
+
+def on_commit(func, *args, **kwargs):
+    """Откладывает сброс кэша и постановку задач до коммита записи.
+
+    Иначе другой процесс увидит новую версию страницы раньше данных,
+    построит её по старым и закэширует под новой версией.
+    """
+    transaction.on_commit(lambda: func(*args, **kwargs))
+
+
+def post_namespaces(post):
+    namespaces = [
+        cache.INDEX,
+        cache.profile_namespace(post.author.username),
+        cache.post_namespace(post.pk),
+    ]
+    if post.group_id:
+        namespaces.append(cache.group_namespace(post.group.slug))
+    return namespaces
+
+
+def comment_namespaces(post_id):
+    """Комментарий меняет страницу поста и счётчик в карточках лент.
+
+    Ленты подписок не сбрасываются: карточка с новым счётчиком попадёт
+    в них при следующем сбросе, ключ фрагмента карточки его учитывает.
+    """
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if row is None:
+        return []
+    username, slug = row
+    namespaces = [
+        cache.INDEX,
+        cache.profile_namespace(username),
+        cache.post_namespace(post_id),
+    ]
+    if slug:
+        namespaces.append(cache.group_namespace(slug))
+    return namespaces
+
+
+def bump_follow_feeds(author_id):
+    """Правка поста видна в лентах подписчиков.
+
+    Страницы подписок на крупного автора зависят от версии его профиля;
+    ленты подписчиков мелкого автора сбрасывает задача вне запроса.
+    """
+    on_commit(
+        enqueue,
+        'posts.bump_follow_feeds',
+        key=f'bump_follow_feeds:{author_id}',
+        author_id=author_id,
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    instance._previous_group_slug = instance._previous_group_id = None
+    if instance.pk:
+        instance._previous_group_id, instance._previous_group_slug = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'group__slug'
+            ).first() or (None, None)
+        )
+
+
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    instance._previous_names = None
+    # Вход сохраняет только last_login: имя не меняется, запрос не нужен.
+    if update_fields is not None and not set(update_fields) & set(
+            USER_NAME_FIELDS):
+        return
+    if instance.pk:
+        instance._previous_names = User.objects.filter(
+            pk=instance.pk).values_list(*USER_NAME_FIELDS).first()
+
+
+def user_namespaces(user, previous_username):
+    """Имя автора выводится в карточках его постов и в ETag страниц."""
+    namespaces = [
+        cache.INDEX,
+        cache.profile_namespace(user.username),
+        cache.profile_namespace(previous_username),
+    ]
+    slugs = Post.objects.filter(
+        author=user, group__isnull=False,
+    ).values_list('group__slug', flat=True).distinct()
+    namespaces.extend(cache.group_namespace(slug) for slug in slugs)
+    return namespaces
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        ProfileStats.objects.get_or_create(user=instance)
+    previous = getattr(instance, '_previous_names', None)
+    names = tuple(getattr(instance, field) for field in USER_NAME_FIELDS)
+    if previous is None or previous == names:
+        return
+    on_commit(cache.bump, *user_namespaces(instance, previous[0]))
+    bump_follow_feeds(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if created:
+        GroupStats.objects.get_or_create(group=instance)
+    on_commit(
+        cache.bump, cache.GROUPS, cache.group_namespace(instance.slug))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    on_commit(cache.bump, cache.GROUPS)
+
+
+def move_group(post, previous_group_id):
+    """Сводки групп при публикации или переносе поста в другую группу."""
+    if previous_group_id == post.group_id:
+        return []
+    counters.change_group(
+        previous_group_id, post.author_id, post.pub_date, -1)
+    counters.change_group(post.group_id, post.author_id, post.pub_date, 1)
+    return [cache.GROUPS]
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    namespaces = move_group(
+        instance, getattr(instance, '_previous_group_id', None))
+    if created:
+        counters.change_stats(instance.author_id, 'posts_count', 1)
+        popular.add(instance.pk, settings.POPULAR_POST_WEIGHT)
+        on_commit(enqueue, 'posts.fan_out', key=f'fan_out:{instance.pk}',
+                  post_id=instance.pk)
+    else:
+        bump_follow_feeds(instance.author_id)
+    get_backend().index(instance)
+    namespaces.extend(post_namespaces(instance))
+    previous_slug = getattr(instance, '_previous_group_slug', None)
+    if previous_slug:
+        namespaces.append(cache.group_namespace(previous_slug))
+    on_commit(cache.bump, *namespaces)
+    if settings.PAGE_CACHE_WARM and not settings.JOBS_EAGER:
+        paths = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=(instance.author.username,)),
+        ]
+        if instance.group_id:
+            paths.append(
+                reverse('posts:group_list', args=(instance.group.slug,))
+            )
+        on_commit(enqueue, 'posts.warm_cache',
+                  key=f'warm_cache:{instance.pk}', paths=paths)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_stats(instance.author_id, 'posts_count', -1)
+    counters.change_group(
+        instance.group_id, instance.author_id, instance.pub_date, -1)
+    get_backend().remove(instance.pk)
+    bump_follow_feeds(instance.author_id)
+    namespaces = post_namespaces(instance)
+    if instance.group_id:
+        namespaces.append(cache.GROUPS)
+    on_commit(cache.bump, *namespaces)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments(instance.post_id, 1)
+        popular.add(instance.post_id, settings.POPULAR_COMMENT_WEIGHT)
+    on_commit(cache.bump, *comment_namespaces(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+    on_commit(cache.bump, *comment_namespaces(instance.post_id))
+
+
+def bump_follow_pages(follow):
+    """Лента подписчика и профили обоих: у автора меняется число
+    подписчиков, у подписчика — число подписок."""
+    on_commit(
+        cache.bump,
+        cache.follow_namespace(follow.user_id),
+        cache.profile_namespace(follow.author.username),
+        cache.profile_namespace(follow.user.username),
+    )
+
+
+def change_follow_stats(follow, delta):
+    counters.change_stats(follow.author_id, 'followers_count', delta)
+    counters.change_stats(follow.user_id, 'following_count', delta)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        change_follow_stats(instance, 1)
+        on_commit(
+            enqueue,
+            'posts.backfill',
+            key=f'backfill:{instance.user_id}:{instance.author_id}',
+            user_id=instance.user_id,
+            author_id=instance.author_id,
+        )
+    bump_follow_pages(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_follow_stats(instance, -1)
+    feed.trim(instance.user_id, instance.author_id)
+    if ProfileStats.objects.filter(
+        user_id=instance.author_id,
+        followers_count=settings.FEED_FANOUT_THRESHOLD,
+    ).exists():
+        # Автор перестал быть крупным: его посты снова читаются только
+        # из FeedEntry, и у подписчиков их там ещё нет.
+        on_commit(
+            enqueue,
+            'posts.backfill_followers',
+            key=f'backfill_followers:{instance.author_id}',
+            author_id=instance.author_id,
+        )
+    bump_follow_pages(instance)
@@ -0,0 +1,139 @@
+"""Ленты RSS и Atom для программ чтения.
+
+Записи берутся тем же запросом for_listing, что и карточки постов.
+Представления лент в views.py кэшируются по версиям пространств имён,
+как страницы, поэтому сохранение поста сбрасывает и их.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core import signing
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.text import Truncator
+
+from . import feed
+from .models import Group, Post, User
+from .utils import POSTS_ORDERING
+
+FORMATS = {'rss': Rss201rev2Feed, 'atom': Atom1Feed}
+FOLLOW_SALT = 'posts.syndication.follow'
+
+
+class FormatConverter:
+    regex = '|'.join(FORMATS)
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+def follow_token(user):
+    """Подписанный адрес ленты подписок: читалки не входят на сайт."""
+    return signing.Signer(salt=FOLLOW_SALT).sign(str(user.pk))
+
+
+def follow_user_id(token):
+    try:
+        return int(signing.Signer(salt=FOLLOW_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        raise Http404
+
+
+class PostsFeed(Feed):
+    title = 'Yatube'
+    description = 'Последние записи на Yatube'
+
+    def __init__(self, fmt):
+        super().__init__()
+        self.feed_type = FORMATS[fmt]
+
+    def link(self, obj):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects.for_listing()
+
+    def items(self, obj):
+        return self.posts(obj).order_by(
+            *POSTS_ORDERING)[:settings.SYNDICATION_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).chars(80)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=(item.pk,))
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_author_link(self, item):
+        return reverse('posts:profile', args=(item.author.username,))
+
+    def item_categories(self, item):
+        return (item.group.title,) if item.group_id else ()
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(
+            Group.objects.only('title', 'slug', 'description'), slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', args=(obj.slug,))
+
+    def posts(self, obj):
+        return Post.objects.for_listing().filter(group=obj)
+
+
+class ProfileFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(
+            User.objects.only('username', 'first_name', 'last_name'),
+            username=username,
+        )
+
+    def title(self, obj):
+        return f'Yatube: {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Записи пользователя {obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=(obj.username,))
+
+    def posts(self, obj):
+        return Post.objects.for_listing().filter(author=obj)
+
+
+class FollowFeed(PostsFeed):
+    title = 'Yatube: подписки'
+    description = 'Записи избранных авторов'
+
+    def get_object(self, request, token):
+        return get_object_or_404(
+            User.objects.only('username'), pk=follow_user_id(token))
+
+    def link(self, obj):
+        return reverse('posts:follow_index')
+
+    def items(self, obj):
+        return feed.latest(obj, settings.SYNDICATION_ITEMS)
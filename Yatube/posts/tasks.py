@@ -0,0 +1,57 @@
+from core.jobs import job, periodic
+
+from . import cache, counters, feed, popular
+from .images import render_post_image
+from .models import Follow, Post
+
+
+@job('posts.render_image')
+def render_image(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        render_post_image(post)
+
+
+@job('posts.fan_out')
+def fan_out(post_id):
+    post = Post.objects.filter(pk=post_id).only(
+        'author', 'pub_date'
+    ).first()
+    if post is not None:
+        followers = feed.fan_out(post)
+        cache.bump(*(cache.follow_namespace(user_id) for user_id in followers))
+
+
+@job('posts.bump_follow_feeds')
+def bump_follow_feeds(author_id):
+    """Сбрасывает ленты подписчиков мелкого автора после правки поста."""
+    followers = feed.small_author_followers(author_id)
+    cache.bump(*(cache.follow_namespace(user_id) for user_id in followers))
+
+
+@job('posts.backfill')
+def backfill(user_id, author_id):
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        feed.backfill(user_id, author_id)
+
+
+@job('posts.backfill_followers')
+def backfill_followers(author_id):
+    followers = feed.backfill_followers(author_id)
+    cache.bump(*(cache.follow_namespace(user_id) for user_id in followers))
+
+
+@job('posts.recount_stats')
+def recount_stats():
+    counters.recount_all()
+
+
+@job('posts.warm_cache')
+def warm_cache(paths):
+    cache.warm(paths)
+
+
+@periodic('posts.decay_scores')
+def decay_scores(elapsed):
+    popular.decay(elapsed)
+    cache.bump(cache.POPULAR)
@@ -0,0 +1,71 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase
+from django.urls import reverse
+
+from posts import async_views
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class AsyncViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='async-author')
+        cls.reader = User.objects.create_user(username='async-reader')
+        cls.group = Group.objects.create(title='async', slug='async')
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.post = Post.objects.create(
+                text='async-text', author=cls.author, group=cls.group)
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='async-comment')
+            Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    def request(self, name, user=None, **kwargs):
+        request = self.factory.get(reverse(name, kwargs=kwargs or None))
+        request.user = user or AnonymousUser()
+        request.session = {}
+        return request
+
+    async def test_read_pages(self):
+        pages = (
+            (async_views.index, self.request('posts:index'), {}),
+            (async_views.group_posts,
+             self.request('posts:group_list', slug='async'),
+             {'slug': 'async'}),
+            (async_views.profile,
+             self.request('posts:profile', username='async-author'),
+             {'username': 'async-author'}),
+            (async_views.post_detail,
+             self.request('posts:post_detail', post_id=self.post.pk),
+             {'post_id': self.post.pk}),
+        )
+        for view, request, kwargs in pages:
+            with self.subTest(view=view.__name__):
+                response = await view(request, **kwargs)
+                self.assertContains(response, 'async-text')
+                self.assertIn('ETag', response)
+
+    async def test_profile_follow_state(self):
+        request = self.request(
+            'posts:profile', user=self.reader, username='async-author')
+        response = await async_views.profile(request, username='async-author')
+        self.assertContains(response, 'Отписаться')
+
+    async def test_not_modified(self):
+        response = await async_views.index(self.request('posts:index'))
+        request = self.request('posts:index')
+        request.META['HTTP_IF_NONE_MATCH'] = response['ETag']
+        response = await async_views.index(request)
+        self.assertEqual(response.status_code, 304)
+
+    async def test_follow_index(self):
+        response = await async_views.follow_index(
+            self.request('posts:follow_index'))
+        self.assertEqual(response.status_code, 302)
+        response = await async_views.follow_index(
+            self.request('posts:follow_index', user=self.reader))
+        self.assertContains(response, 'async-text')
@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, FeedEntry, Follow, Post, ProfileStats
+from posts.search import get_backend
+
+User = get_user_model()
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        cls.author = User.objects.create_user(username='import-author')
+        cls.reader = User.objects.create_user(username='import-reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_export_posts_round_trips_through_import(self):
+        post = Post.objects.create(author=self.author, text='exported')
+        Comment.objects.create(
+            post=post, author=self.reader, text='exported comment')
+        path = os.path.join(self.directory, 'export.jsonl')
+        call_command('export_posts', '--author', 'import-author',
+                     '--output', path, '--chunk-size', '1')
+        post.delete()
+        call_command('import_posts', path, stdout=StringIO())
+        post = Post.objects.get(text='exported')
+        self.assertEqual(post.comments.get().text, 'exported comment')
+
+    def test_import_jsonl_keeps_derived_data(self):
+        records = [
+            {'type': 'post', 'ref': 'a', 'author': 'import-author',
+             'group': 'import-group', 'text': 'imported unicorn',
+             'pub_date': '2020-01-02T03:04:05+00:00'},
+            {'type': 'comment', 'post_ref': 'a', 'author': 'import-reader',
+             'text': 'imported comment'},
+            {'type': 'follow', 'user': 'new-reader',
+             'author': 'import-author'},
+            {'type': 'post', 'author': 'import-author', 'text': ''},
+        ]
+        path = self.write('data.jsonl', '\n'.join(
+            json.dumps(record) for record in records))
+        call_command('import_posts', path, '--create-missing',
+                     '--batch-size', '2', stdout=StringIO())
+        post = Post.objects.get(text='imported unicorn')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.group.slug, 'import-group')
+        self.assertEqual(post.comments_count, 1)
+        stats = ProfileStats.objects.get(user=self.author)
+        self.assertEqual((stats.posts_count, stats.followers_count), (1, 2))
+        self.assertEqual(
+            FeedEntry.objects.filter(post=post).count(), 2)
+        self.assertEqual(
+            get_backend().search('unicorn', 10)[0], [post.pk])
+
+    def test_import_csv(self):
+        path = self.write(
+            'posts.csv',
+            'author,group,text\nimport-author,,csv post\n',
+        )
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertTrue(Post.objects.filter(
+            text='csv post', group__isnull=True).exists())
+
+    def test_import_skips_invalid_json_lines(self):
+        path = self.write('broken.jsonl', '\n'.join((
+            json.dumps({'author': 'import-author', 'text': 'first'}),
+            '{"author": "import-author", "text": ',
+            '[1, 2]',
+            json.dumps({'author': 'import-author', 'text': 'second'}),
+        )))
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_posts', path, stdout=stdout, stderr=stderr)
+        self.assertEqual(
+            Post.objects.filter(text__in=('first', 'second')).count(), 2)
+        self.assertIn('Строка 2 пропущена', stderr.getvalue())
+        self.assertIn('Строка 3 пропущена', stderr.getvalue())
+        self.assertIn('invalid — 2', stdout.getvalue())
+
+    def test_import_recounts_only_touched_profiles(self):
+        bystander = User.objects.create_user(username='import-bystander')
+        ProfileStats.objects.filter(user=bystander).update(posts_count=7)
+        path = self.write(
+            'posts.jsonl',
+            json.dumps({'author': 'import-author', 'text': 'touched'}),
+        )
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(
+            ProfileStats.objects.get(user=self.author).posts_count, 1)
+        self.assertEqual(
+            ProfileStats.objects.get(user=bystander).posts_count, 7)
@@ -0,0 +1,97 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, GroupStats, Post, ProfileStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.author = User.objects.create_user(username='test-author')
+        cls.post = Post.objects.create(author=cls.author, text='test-text')
+
+    def test_counters_follow_changes(self):
+        Comment.objects.create(post=self.post, author=self.user, text='c')
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(
+            ProfileStats.objects.get(user=self.author).posts_count, 1)
+        self.assertEqual(
+            ProfileStats.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            ProfileStats.objects.get(user=self.user).following_count, 1)
+        follow.delete()
+        self.assertEqual(
+            ProfileStats.objects.get(user=self.author).followers_count, 0)
+
+    def test_recount_stats_repairs_drift(self):
+        ProfileStats.objects.filter(user=self.author).update(posts_count=42)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=7)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertEqual(
+            ProfileStats.objects.get(user=self.author).posts_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+
+class GroupStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='group-author')
+        cls.other = User.objects.create_user(username='group-other')
+        cls.group = Group.objects.create(title='g', slug='stats-group')
+        cls.target = Group.objects.create(title='t', slug='stats-target')
+        cls.first = Post.objects.create(
+            author=cls.author, group=cls.group, text='first')
+        cls.second = Post.objects.create(
+            author=cls.author, group=cls.group, text='second')
+        cls.third = Post.objects.create(
+            author=cls.other, group=cls.group, text='third')
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def test_stats_follow_posts(self):
+        stats = self.stats(self.group)
+        self.assertEqual(stats.posts_count, 3)
+        self.assertEqual(stats.last_post_at, self.third.pub_date)
+        self.assertEqual(stats.top_authors, [
+            {'username': 'group-author', 'posts_count': 2},
+            {'username': 'group-other', 'posts_count': 1},
+        ])
+
+    def test_moving_and_deleting_posts(self):
+        self.third.group = self.target
+        self.third.save()
+        stats = self.stats(self.group)
+        self.assertEqual(stats.posts_count, 2)
+        self.assertEqual(stats.last_post_at, self.second.pub_date)
+        self.assertEqual(
+            stats.top_authors,
+            [{'username': 'group-author', 'posts_count': 2}],
+        )
+        self.assertEqual(self.stats(self.target).posts_count, 1)
+        self.third.delete()
+        target = self.stats(self.target)
+        self.assertEqual(
+            (target.posts_count, target.last_post_at, target.top_authors),
+            (0, None, []),
+        )
+
+    def test_recount_repairs_group_stats(self):
+        GroupStats.objects.filter(group=self.group).update(
+            posts_count=42, top_authors=[])
+        GroupStats.objects.filter(group=self.target).delete()
+        call_command('recount_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.group).posts_count, 3)
+        self.assertEqual(len(self.stats(self.group).top_authors), 2)
+        self.assertEqual(self.stats(self.target).posts_count, 0)
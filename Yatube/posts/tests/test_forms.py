@@ -99,6 +99,27 @@ class PostFormTests(TestCase):
             ).exists()
         )
 
+    def test_create_post_renders_image(self):
+        uploaded = SimpleUploadedFile(
+            name='render.gif',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'with-image', 'image': uploaded},
+                follow=True
+            )
+        post = Post.objects.get(text='with-image')
+        self.assertEqual(
+            set(post.renditions),
+            {'card', 'card_webp', 'card_small', 'card_small_webp'},
+        )
+        self.assertTrue(post.renditions['card_webp'].endswith('.webp'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, post.renditions['card_small'])
+
     def test_edit_post(self):
         form_data = {
             'text': self.post.text,
@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from posts.loaders import Loader
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class LoaderTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(username=f'loader-{number}')
+            for number in range(3)
+        ]
+        cls.posts = [
+            Post.objects.create(author=author, text='loader')
+            for author in cls.authors
+        ]
+
+    def test_keys_are_fetched_in_one_query(self):
+        loader = Loader()
+        ids = [author.pk for author in self.authors]
+        loader.users.want(ids + [0])
+        with self.assertNumQueries(1):
+            self.assertEqual(loader.users.get(ids[0]).username, 'loader-0')
+            self.assertEqual(loader.users.get(ids[2]).username, 'loader-2')
+            self.assertIsNone(loader.users.get(0))
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                loader.users.get_many(ids)[ids[1]].username, 'loader-1')
+
+    def test_posts_and_following_fetched_in_one_query(self):
+        loader = Loader(self.authors[0])
+        Follow.objects.create(user=self.authors[0], author=self.authors[1])
+        with self.assertNumQueries(1):
+            posts = loader.posts.get_many([post.pk for post in self.posts])
+        self.assertEqual(posts[self.posts[0].pk].comments_count, 0)
+        self.assertEqual(len(posts), 3)
+        with self.assertNumQueries(1):
+            following = loader.following.get_many(
+                [author.pk for author in self.authors])
+        self.assertEqual(
+            following,
+            {self.authors[0].pk: None, self.authors[1].pk: True,
+             self.authors[2].pk: None},
+        )
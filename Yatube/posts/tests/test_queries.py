@@ -0,0 +1,77 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+from Yatube.settings import VIEW_COEFF
+
+from posts.models import Comment, Follow, Group, Post, User
+
+from .utils import QueryBudgetMixin
+
+QUERY_BUDGETS = {
+    'posts:index': 1,
+    'posts:group_list': 2,
+    'posts:profile': 2,
+    'posts:post_detail': 2,
+}
+AUTH_QUERY_BUDGETS = {
+    'posts:index': 3,
+    'posts:group_list': 4,
+    'posts:profile': 5,
+    'posts:post_detail': 4,
+    'posts:follow_index': 5,
+}
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='group', slug='group')
+        with cls.captureOnCommitCallbacks(execute=True):
+            for i in range(VIEW_COEFF + 3):
+                author = User.objects.create_user(username=f'author-{i}')
+                group = Group.objects.create(title=f'g-{i}', slug=f'g-{i}')
+                Follow.objects.create(user=cls.reader, author=author)
+                post = Post.objects.create(text=f'text-{i}', author=author,
+                                           group=group)
+                Comment.objects.create(post=post, author=author, text='c')
+            for i in range(VIEW_COEFF + 3):
+                cls.post = Post.objects.create(
+                    text=f'own-{i}', author=cls.author, group=cls.group)
+                Comment.objects.create(post=cls.post, author=cls.reader,
+                                       text=f'comment-{i}')
+        cls.urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse('posts:group_list',
+                                        args=(cls.group.slug,)),
+            'posts:profile': reverse('posts:profile',
+                                     args=(cls.author.username,)),
+            'posts:post_detail': reverse('posts:post_detail',
+                                         args=(cls.post.pk,)),
+        }
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_guest_query_budget(self):
+        for name, url in self.urls.items():
+            with self.subTest(view=name):
+                self.assertQueryBudget(self.guest_client, url,
+                                       QUERY_BUDGETS[name])
+
+    def test_authorized_query_budget(self):
+        for name, url in self.urls.items():
+            with self.subTest(view=name):
+                self.assertQueryBudget(self.authorized_client, url,
+                                       AUTH_QUERY_BUDGETS[name])
+
+    def test_follow_index_query_budget(self):
+        response = self.assertQueryBudget(
+            self.authorized_client,
+            reverse('posts:follow_index'),
+            AUTH_QUERY_BUDGETS['posts:follow_index'],
+        )
+        self.assertEqual(len(response.context['page_obj']), VIEW_COEFF)
@@ -0,0 +1,69 @@
+import re
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from Yatube.settings import VIEW_COEFF
+
+from posts.feed import FEED_ORDERING
+from posts.models import Comment, FeedEntry, Follow, Group, Post, User
+from posts.utils import FORWARD, POSTS_ORDERING, CursorPaginator
+
+FULL_SCAN = re.compile(r'\bSCAN (TABLE )?\w+$', re.MULTILINE)
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.group = Group.objects.create(title='test-title', slug='slug')
+        cls.post = Post.objects.create(text='test-text', author=cls.user,
+                                       group=cls.group)
+
+    def assertIndexedPlan(self, queryset):
+        plan = queryset.explain()
+        with self.subTest(sql=str(queryset.query)):
+            self.assertNotRegex(plan, FULL_SCAN)
+            self.assertNotIn(TEMP_SORT, plan)
+
+    def assertIndexedPages(self, queryset, ordering=POSTS_ORDERING):
+        paginator = CursorPaginator(queryset, VIEW_COEFF, ordering)
+        self.assertIndexedPlan(paginator.page_query())
+        deep_page = (FORWARD, [timezone.now(), self.post.pk])
+        self.assertIndexedPlan(paginator.page_query(deep_page))
+
+    def test_index_feed(self):
+        self.assertIndexedPages(Post.objects.for_listing())
+
+    def test_group_feed(self):
+        self.assertIndexedPages(self.group.posts.for_listing())
+
+    def test_profile_feed(self):
+        self.assertIndexedPages(self.user.posts.for_listing())
+
+    def test_follow_feed(self):
+        self.assertIndexedPages(
+            FeedEntry.objects.filter(user=self.user).only('pub_date', 'post'),
+            FEED_ORDERING,
+        )
+        self.assertIndexedPlan(
+            Post.objects.for_listing().order_by().filter(pk__in=[1, 2])
+        )
+
+    def test_comments_by_post(self):
+        self.assertIndexedPages(
+            Comment.objects.filter(post=self.post).select_related('author'),
+            ('created', 'id'),
+        )
+
+    def test_follow_lookups(self):
+        self.assertIndexedPlan(
+            Follow.objects.filter(author=self.user).values_list('user_id')
+        )
+        self.assertIndexedPlan(
+            Follow.objects.filter(user=self.user, author=self.user)
+        )
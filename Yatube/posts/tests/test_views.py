@@ -1,10 +1,29 @@
+import csv
+import datetime
+import importlib
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+
 from django import forms
+from django.conf import settings
+from django.contrib import admin
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.files.base import ContentFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from Yatube.settings import VIEW_COEFF
+from django.utils import timezone
+from Yatube.settings import COMMENTS_PER_PAGE, VIEW_COEFF
 
-from posts.models import Follow, Group, Post, User
+from core import jobs
+from core.models import Job, PeriodicRun
+from posts import cache as page_cache
+from posts import export, popular, syndication, urls
+from posts.models import (
+    Comment, FeedEntry, Follow, Group, Post, PostScore, User,
+)
 
 POSTS_CREATED = 13
 SLUG = 'slug'
@@ -42,12 +61,144 @@ class CacheTests(TestCase):
     def test_cache_index_page(self):
         response = self.author_client.get(reverse('posts:index'))
         self.assertContains(response, self.new_post)
-        self.new_post.delete()
+        Post.objects.filter(pk=self.new_post.pk).update(text='silent-edit')
         response = self.author_client.get(reverse('posts:index'))
         self.assertContains(response, self.new_post)
-        cache.clear()
+        self.assertNotContains(response, 'silent-edit')
+
+    def test_post_delete_invalidates_index_page(self):
+        cache.set('unrelated-key', 'value')
+        response = self.author_client.get(reverse('posts:index'))
+        self.assertContains(response, self.new_post)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.new_post.delete()
         response = self.author_client.get(reverse('posts:index'))
         self.assertNotContains(response, self.new_post)
+        self.assertEqual(cache.get('unrelated-key'), 'value')
+
+    def test_new_post_invalidates_only_affected_pages(self):
+        other_group = Group.objects.create(title='other', slug='other')
+        group_url = reverse('posts:group_list',
+                            kwargs={SLUG: other_group.slug})
+        self.author_client.get(group_url)
+        Post.objects.create(text='fresh-post', author=self.user,
+                            group=self.group)
+        response = self.author_client.get(reverse('posts:index'))
+        self.assertContains(response, 'fresh-post')
+        response = self.author_client.get(group_url)
+        self.assertIsNone(response.context)
+
+    def test_page_rendered_before_commit_not_cached_under_new_version(self):
+        url = reverse('posts:index')
+        namespaces = [page_cache.INDEX]
+        version = page_cache.get_versions(namespaces)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(text='before-commit', author=self.user)
+            # Версия сбрасывается только после коммита: страница,
+            # построенная до него, ложится в кэш под старой версией.
+            self.assertEqual(page_cache.get_versions(namespaces), version)
+            self.author_client.get(url)
+        self.assertNotEqual(page_cache.get_versions(namespaces), version)
+        response = self.author_client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'before-commit')
+
+    @override_settings(PAGE_CACHE_WARM=True)
+    def test_warm_up_is_left_to_the_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(text='eager', author=self.user)
+        self.assertFalse(Job.objects.exists())
+        with override_settings(JOBS_EAGER=False), \
+                self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(text='queued', author=self.user)
+        job = Job.objects.get(key=f'warm_cache:{post.pk}')
+        self.assertEqual(job.name, 'posts.warm_cache')
+        self.assertIn(reverse('posts:index'), job.payload['paths'])
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='etag-user')
+        cls.post = Post.objects.create(text='etag-text', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.detail_url = reverse('posts:post_detail',
+                                  kwargs={POST_ID: self.post.pk})
+
+    def test_index_not_modified_without_queries(self):
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_post_changes_index_etag(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(text='etag-fresh', author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'etag-fresh')
+
+    def test_etag_depends_on_user(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_comment_changes_detail_etag(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=self.user,
+                                   text='etag-comment')
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'etag-comment')
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.post = Post.objects.create(text='card-text', author=cls.user)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+        cache.clear()
+
+    def test_card_reused_until_post_edited(self):
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='silent-edit')
+        response = self.client.get(
+            reverse('posts:profile', kwargs={USERNAME: self.user.username}))
+        self.assertContains(response, 'card-text')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author_client.post(
+                reverse('posts:post_edit', kwargs={POST_ID: self.post.pk}),
+                data={'text': 'edited-text'},
+            )
+        response = self.client.get(
+            reverse('posts:profile', kwargs={USERNAME: self.user.username}))
+        self.assertContains(response, 'edited-text')
+
+    def test_card_follows_author_name(self):
+        self.client.get(reverse('posts:index'))
+        self.user.first_name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertContains(self.client.get(reverse('posts:index')), 'Renamed')
 
 
 class GroupPagesTests(TestCase):
@@ -111,15 +262,16 @@ class FollowTests(TestCase):
             title='test-title',
             slug='test-slug',
         )
-        cls.post = Post.objects.create(
-            text='test-text',
-            author=cls.user,
-            group=cls.group,
-        )
-        cls.follower = Follow.objects.create(
-            author=cls.user,
-            user=cls.user
-        )
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.post = Post.objects.create(
+                text='test-text',
+                author=cls.user,
+                group=cls.group,
+            )
+            cls.follower = Follow.objects.create(
+                author=cls.user,
+                user=cls.user
+            )
 
     @classmethod
     def tearDownClass(cls):
@@ -159,15 +311,116 @@ class FollowTests(TestCase):
 
     def test_adding_to_favorites(self):
         followers_count = Follow.objects.count()
-        self.other_authorized_client.get(
-            reverse('posts:profile_follow', kwargs={USERNAME:
-                                                    self.user.username})
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_authorized_client.get(
+                reverse('posts:profile_follow', kwargs={USERNAME:
+                                                        self.user.username})
+            )
         response = self.authorized_client.get(reverse('posts:follow_index'))
         follow_index = response.context['page_obj'][0]
         self.assertEqual(follow_index, self.post)
         self.assertEqual(Follow.objects.count(), followers_count + 1)
 
+    def test_new_post_fanned_out_to_followers(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.other_user, author=self.user)
+            new_post = Post.objects.create(text='fan-out', author=self.user)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.other_user, post=new_post).exists())
+        response = self.other_authorized_client.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+
+    def test_unfollow_trims_feed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_authorized_client.get(
+                reverse('posts:profile_follow',
+                        kwargs={USERNAME: self.user.username}))
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.other_user).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_authorized_client.get(
+                reverse('posts:profile_unfollow',
+                        kwargs={USERNAME: self.user.username}))
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.other_user).exists())
+
+    @override_settings(FEED_FANOUT_THRESHOLD=0)
+    def test_big_author_read_on_demand(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.other_user, author=self.user)
+            new_post = Post.objects.create(text='fan-in', author=self.user)
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.other_user).exists())
+        response = self.other_authorized_client.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+
+    def test_follow_refreshes_follower_profile(self):
+        url = reverse('posts:profile', args=(self.other_user.username,))
+        self.assertContains(self.guest_client.get(url), 'подписок: 0')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_authorized_client.get(
+                reverse('posts:profile_follow',
+                        kwargs={USERNAME: self.user.username}))
+        self.assertContains(self.guest_client.get(url), 'подписок: 1')
+
+    def test_comment_does_not_bump_follow_pages(self):
+        Follow.objects.create(user=self.other_user, author=self.user)
+        follow = [page_cache.follow_namespace(self.other_user.pk)]
+        index = [page_cache.INDEX]
+        follow_version = page_cache.get_versions(follow)
+        index_version = page_cache.get_versions(index)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(
+                post=self.post, author=self.other_user, text='comment')
+        self.assertEqual(page_cache.get_versions(follow), follow_version)
+        self.assertNotEqual(page_cache.get_versions(index), index_version)
+
+    @override_settings(FEED_FANOUT_THRESHOLD=0)
+    def test_big_author_post_does_not_bump_followers(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.other_user, author=self.user)
+        url = reverse('posts:follow_index')
+        self.other_authorized_client.get(url)
+        namespace = [page_cache.follow_namespace(self.other_user.pk)]
+        version = page_cache.get_versions(namespace)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(text='big author post', author=self.user)
+        self.assertEqual(page_cache.get_versions(namespace), version)
+        self.assertContains(
+            self.other_authorized_client.get(url), 'big author post')
+
+    def test_small_author_edit_refreshes_follow_page(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.other_user, author=self.user)
+        url = reverse('posts:follow_index')
+        self.other_authorized_client.get(url)
+        self.post.text = 'edited text'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.save()
+        self.assertContains(
+            self.other_authorized_client.get(url), 'edited text')
+
+    @override_settings(FEED_FANOUT_THRESHOLD=1)
+    def test_author_below_threshold_backfills_followers(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.other_user, author=self.user)
+            new_post = Post.objects.create(text='fan-in', author=self.user)
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.other_user).exists())
+        self.other_authorized_client.get(reverse('posts:follow_index'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(user=self.user, author=self.user).delete()
+        self.assertEqual(
+            set(FeedEntry.objects.filter(
+                user=self.other_user).values_list('post_id', flat=True)),
+            {self.post.pk, new_post.pk},
+        )
+        response = self.other_authorized_client.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+
     def test_authorized_user_unfollow(self):
         Follow.objects.create(
             author=self.other_user,
@@ -330,7 +583,395 @@ class PostPagesTests(TestCase):
     def test_second_page_contains_three_records(self):
         for i in PostPagesTests.urls.keys():
             with self.subTest(i=i):
-                response = self.client.get(self.urls[i] + '?page=2')
+                first_page = self.client.get(self.urls[i]).context['page_obj']
+                response = self.client.get(self.urls[i] + first_page.next_url)
                 self.assertEqual(len(
                     response.context.get('page_obj').object_list),
                     POSTS_CREATED - VIEW_COEFF)
+
+    def test_cursor_pages_do_not_overlap(self):
+        first_page = self.client.get(self.urls[1]).context['page_obj']
+        second_page = self.client.get(
+            self.urls[1] + first_page.next_url).context['page_obj']
+        self.assertFalse(first_page.has_previous())
+        self.assertFalse(second_page.has_next())
+        self.assertFalse(set(first_page) & set(second_page))
+        back_page = self.client.get(
+            self.urls[1] + second_page.previous_url).context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+
+    def test_invalid_cursor_shows_first_page(self):
+        first_page = self.client.get(self.urls[1]).context['page_obj']
+        response = self.client.get(self.urls[1] + '?cursor=broken')
+        self.assertEqual(list(response.context['page_obj']), list(first_page))
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.other_user = User.objects.create_user(username='other-user')
+        cls.group = Group.objects.create(
+            title='test-title',
+            slug='test-slug',
+        )
+        cls.rare_post = Post.objects.create(
+            text='блюз и джаз',
+            author=cls.user,
+        )
+        cls.dense_post = Post.objects.create(
+            text='блюз блюз блюз',
+            author=cls.other_user,
+            group=cls.group,
+        )
+        for i in range(VIEW_COEFF + 2):
+            Post.objects.create(text=f'рок {i}', author=cls.user)
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return response.context['page_obj']
+
+    def test_search_ranks_matches(self):
+        self.assertEqual(
+            list(self.search(q='блюз')), [self.dense_post, self.rare_post])
+
+    def test_search_filters(self):
+        self.assertEqual(
+            list(self.search(q='блюз', group=self.group.slug)),
+            [self.dense_post])
+        self.assertEqual(
+            list(self.search(q='блюз', author=self.user.username)),
+            [self.rare_post])
+
+    def test_index_follows_post_changes(self):
+        rare_post = Post.objects.get(pk=self.rare_post.pk)
+        rare_post.text = 'только джаз'
+        rare_post.save()
+        self.assertEqual(list(self.search(q='блюз')), [self.dense_post])
+        Post.objects.filter(pk=self.dense_post.pk).delete()
+        self.assertEqual(list(self.search(q='блюз')), [])
+
+    def test_search_cursor_paging(self):
+        first_page = self.search(q='рок')
+        self.assertEqual(len(first_page), VIEW_COEFF)
+        self.assertFalse(first_page.has_previous())
+        second_page = self.client.get(
+            reverse('posts:search') + first_page.next_url
+        ).context['page_obj']
+        self.assertEqual(len(second_page), 2)
+        self.assertFalse(set(first_page) & set(second_page))
+        self.assertTrue(second_page.has_previous())
+
+    def test_admin_search_uses_index(self):
+        queryset, _ = admin.site._registry[Post].get_search_results(
+            None, Post.objects.all(), 'джаз')
+        self.assertEqual(list(queryset), [self.rare_post])
+
+    def test_search_syntax_is_escaped(self):
+        self.assertEqual(list(self.search(q='"блюз AND (')), [])
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='export-author')
+        cls.other = User.objects.create_user(username='export-other')
+        cls.staff = User.objects.create_user(
+            username='export-staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='export-title', slug='export-slug', description='')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'export {number}')
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[1], author=cls.other, text='export comment')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.url = reverse('posts:profile_export', args=[self.author])
+
+    def test_export_jsonl(self):
+        response = self.client.get(self.url)
+        lines = b''.join(response.streaming_content).decode()
+        records = [json.loads(line) for line in lines.splitlines()]
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['post', 'post', 'comment', 'post', 'post', 'post'],
+        )
+        self.assertEqual(records[2]['post_ref'], self.posts[1].pk)
+        self.assertEqual(records[0]['group'], 'export-slug')
+        self.assertIn('export-author.jsonl', response['Content-Disposition'])
+
+    def test_export_reads_keyset_chunks(self):
+        posts = Post.objects.filter(author=self.author)
+        # По запросу постов и комментариев на пачку и пустая пачка в конце.
+        with self.assertNumQueries(3 * 2 + 1):
+            records = list(export.iter_records(posts, chunk_size=2))
+        self.assertEqual(
+            [record['ref'] for record in records if 'ref' in record],
+            [post.pk for post in self.posts],
+        )
+
+    def test_export_csv(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[2]['text'], 'export comment')
+
+    def test_export_zip_includes_images(self):
+        post = self.posts[0]
+        post.image.save('export.gif', ContentFile(b'GIF89a'), save=True)
+        response = self.client.get(self.url, {'format': 'zip'})
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(
+            archive.read(f'images/{post.image.name}'), b'GIF89a')
+        self.assertEqual(
+            len(archive.read('posts.jsonl').decode().splitlines()), 6)
+
+    def test_export_permissions(self):
+        group_url = reverse('posts:group_export', args=[self.group.slug])
+        other = Client()
+        other.force_login(self.other)
+        staff = Client()
+        staff.force_login(self.staff)
+        self.assertEqual(other.get(self.url).status_code, 403)
+        self.assertEqual(other.get(group_url).status_code, 403)
+        self.assertEqual(staff.get(self.url).status_code, 200)
+        self.assertEqual(staff.get(group_url).status_code, 200)
+        self.assertEqual(Client().get(self.url).status_code, 302)
+
+    def test_export_not_routed_under_asgi(self):
+        self.addCleanup(importlib.reload, urls)
+        with override_settings(ASYNC_VIEWS=True):
+            names = {
+                pattern.name
+                for pattern in importlib.reload(urls).urlpatterns
+            }
+        self.assertIn('profile', names)
+        self.assertNotIn('profile_export', names)
+        self.assertNotIn('group_export', names)
+
+
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='comment-user')
+        cls.post = Post.objects.create(author=cls.user, text='commented')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'comment-{number}')
+            for number in range(COMMENTS_PER_PAGE + 3)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_post_detail_shows_first_comments_page(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'comment-{number}' for number in range(COMMENTS_PER_PAGE)],
+        )
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'data-comments-url')
+
+    def test_comments_fragment_loads_next_page(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        data = self.client.get(
+            url + response.context['comments'].next_url).json()
+        self.assertIn(f'comment-{COMMENTS_PER_PAGE}', data['html'])
+        self.assertIn(f'comment-{COMMENTS_PER_PAGE + 2}', data['html'])
+        self.assertEqual(data['html'].count('media-body'), 3)
+        self.assertIsNone(data['next'])
+
+    def test_add_comment_returns_fragment(self):
+        url = reverse('posts:add_comment', args=[self.post.pk])
+        response = self.client.post(
+            url, {'text': 'fresh-comment'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('fresh-comment', response.json()['html'])
+        response = self.client.post(
+            url, {'text': ''}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+
+
+class PopularTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='popular-user')
+        cls.quiet = Post.objects.create(author=cls.user, text='quiet')
+        cls.discussed = Post.objects.create(author=cls.user, text='loud')
+        for number in range(2):
+            Comment.objects.create(
+                post=cls.discussed, author=cls.user, text=f'reply {number}')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_scores_follow_posts_and_comments(self):
+        self.assertEqual(PostScore.objects.get(post=self.quiet).score, 1)
+        self.assertEqual(PostScore.objects.get(post=self.discussed).score, 3)
+
+    def test_popular_page_reads_top_scores(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('posts:popular'))
+        self.assertTemplateUsed(response, 'posts/popular.html')
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.discussed, self.quiet],
+        )
+        self.assertContains(response, reverse('posts:popular'))
+
+    @override_settings(JOBS_EAGER=True, POPULAR_HALF_LIFE=20 * 60)
+    def test_decay_runs_on_schedule_not_on_writes(self):
+        PeriodicRun.objects.update_or_create(
+            name='posts.decay_scores',
+            defaults={'last_run': timezone.now() - datetime.timedelta(
+                minutes=20)},
+        )
+        Comment.objects.create(
+            post=self.quiet, author=self.user, text='late reply')
+        scores = dict(PostScore.objects.values_list('post_id', 'score'))
+        self.assertEqual(scores, {self.discussed.pk: 3, self.quiet.pk: 2})
+        jobs.enqueue_due()
+        scores = dict(PostScore.objects.values_list('post_id', 'score'))
+        self.assertAlmostEqual(scores[self.discussed.pk], 1.5, places=3)
+        self.assertAlmostEqual(scores[self.quiet.pk], 1, places=3)
+
+    @override_settings(POPULAR_HALF_LIFE=60, POPULAR_MIN_SCORE=0.6)
+    def test_decay_halves_and_prunes(self):
+        popular.decay(60)
+        self.assertEqual(
+            dict(PostScore.objects.values_list('post_id', 'score')),
+            {self.discussed.pk: 1.5},
+        )
+        self.assertEqual(popular.top_ids(), [self.discussed.pk])
+
+    def test_rebuild_matches_incremental_scores(self):
+        incremental = dict(PostScore.objects.values_list('post_id', 'score'))
+        popular.rebuild()
+        rebuilt = dict(PostScore.objects.values_list('post_id', 'score'))
+        self.assertEqual(rebuilt.keys(), incremental.keys())
+        for post_id, score in rebuilt.items():
+            self.assertAlmostEqual(score, incremental[post_id], places=3)
+
+
+class GroupIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='directory-user')
+        cls.groups = Group.objects.bulk_create([
+            Group(title=f'group {number:02}', slug=f'directory-{number}')
+            for number in range(60)
+        ])
+        cls.group = Group.objects.get(slug='directory-0')
+        Post.objects.create(author=cls.user, group=cls.group, text='post')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_directory_lists_stats_without_aggregates(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('posts:group_index'))
+        self.assertTemplateUsed(response, 'posts/group_index.html')
+        page = response.context['page_obj']
+        self.assertEqual(len(page), 50)
+        self.assertEqual(page[0], self.group)
+        self.assertContains(response, 'Записей: 1')
+        self.assertContains(
+            response, reverse('posts:profile', args=('directory-user',)))
+        response = self.client.get(
+            reverse('posts:group_index') + page.next_url)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_new_post_refreshes_cached_directory(self):
+        url = reverse('posts:group_index')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(
+                author=self.user, group=self.group, text='more')
+        self.assertContains(self.client.get(url), 'Записей: 2')
+
+
+class SyndicationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed-author')
+        cls.reader = User.objects.create_user(username='feed-reader')
+        cls.group = Group.objects.create(title='Лента', slug='feed-group')
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text='feed post text')
+            Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_render_listing(self):
+        token = syndication.follow_token(self.reader)
+        urls = {
+            reverse('posts:index_feed', args=('atom',)): 1,
+            reverse('posts:group_feed', args=('feed-group', 'rss')): 2,
+            reverse('posts:profile_feed', args=('feed-author', 'atom')): 2,
+            reverse('posts:follow_feed', args=(token, 'rss')): 5,
+        }
+        for url, queries in urls.items():
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                response = self.client.get(url)
+                self.assertContains(response, 'feed post text')
+        self.assertEqual(
+            self.client.get(reverse('posts:index_feed', args=('rss',)))[
+                'Content-Type'],
+            'application/rss+xml; charset=utf-8',
+        )
+
+    def test_unchanged_feed_answers_304_without_queries(self):
+        url = reverse('posts:index_feed', args=('atom',))
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(author=self.author, text='fresh feed post')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'fresh feed post')
+
+    def test_follow_feed_needs_valid_token(self):
+        token = syndication.follow_token(self.reader)
+        response = self.client.get(
+            reverse('posts:follow_feed', args=(token[:-1], 'atom')))
+        self.assertEqual(response.status_code, 404)
+        self.client.force_login(self.reader)
+        self.assertContains(
+            self.client.get(reverse('posts:follow_index')),
+            reverse('posts:follow_feed', args=(token, 'atom')),
+        )
@@ -0,0 +1,18 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверка фиксированного числа SQL-запросов на представление."""
+
+    def assertQueryBudget(self, client, url, budget):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            '\n'.join(query['sql'] for query in queries.captured_queries),
+        )
+        return response
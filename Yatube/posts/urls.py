@@ -1,14 +1,27 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import path, register_converter
 
-from . import views
+from . import async_views, syndication, views
 
 app_name = 'posts'
 
+register_converter(syndication.FormatConverter, 'feed')
+
+# Под ASGI страницы чтения обслуживаются асинхронными представлениями.
+read_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('group/<slug:slug>/', views.group_posts, name='group_list'),
-    path('profile/<str:username>/', views.profile, name='profile'),
-    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('', read_views.index, name='index'),
+    path('popular/', read_views.popular_posts, name='popular'),
+    path('groups/', read_views.group_index, name='group_index'),
+    path('group/<slug:slug>/', read_views.group_posts, name='group_list'),
+    path('profile/<str:username>/', read_views.profile, name='profile'),
+    path('posts/<int:post_id>/', read_views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
@@ -16,7 +29,24 @@ urlpatterns = [
     ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
-    path('follow/', views.follow_index, name='follow_index'),
+    path('follow/', read_views.follow_index, name='follow_index'),
+    path('feeds/<feed:fmt>/', views.index_feed, name='index_feed'),
+    path(
+        'feeds/group/<slug:slug>/<feed:fmt>/',
+        views.group_feed,
+        name='group_feed'
+    ),
+    path(
+        'feeds/profile/<str:username>/<feed:fmt>/',
+        views.profile_feed,
+        name='profile_feed'
+    ),
+    path(
+        'feeds/follow/<str:token>/<feed:fmt>/',
+        views.follow_feed,
+        name='follow_feed'
+    ),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -28,3 +58,21 @@ urlpatterns = [
         name='profile_unfollow'
     ),
 ]
+
+# Выгрузка отдаёт StreamingHttpResponse с синхронным генератором по ORM.
+# ASGI-обработчик Django 4.0 читает его в цикле событий, где ORM
+# недоступен, поэтому под ASGI адресов выгрузки нет: их обслуживают
+# WSGI-воркеры (прокси направляет на них */export/).
+if not settings.ASYNC_VIEWS:
+    urlpatterns += [
+        path(
+            'profile/<str:username>/export/',
+            views.profile_export,
+            name='profile_export'
+        ),
+        path(
+            'group/<slug:slug>/export/',
+            views.group_export,
+            name='group_export'
+        ),
+    ]
@@ -1,9 +1,221 @@
-from django.core.paginator import Paginator
-from Yatube.settings import VIEW_COEFF
+import base64
+import datetime
+import json
 
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from Yatube.settings import COMMENTS_PER_PAGE, GROUPS_PER_PAGE, VIEW_COEFF
 
-def paginator_fun(queryset, request):
-    result = Paginator(queryset, VIEW_COEFF)
-    page_number = request.GET.get('page')
-    page_obj = result.get_page(page_number)
+from .models import Group
+
+CURSOR_PARAM = 'cursor'
+COMMENTS_PARAM = 'comments'
+POSTS_ORDERING = ('-pub_date', '-id')
+COMMENTS_ORDERING = ('created', 'id')
+GROUPS_ORDERING = ('title', 'id')
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Сохраняет микросекунды: курсор должен точно совпадать с ключом."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    raw = json.dumps(
+        [direction, *values],
+        cls=CursorEncoder,
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Направление и сырые значения курсора или None для битого токена."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, *values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or len(values) != size:
+        return None
+    return direction, values
+
+
+class CursorPage:
+    """Страница keyset-пагинации: без номеров страниц и без COUNT(*)."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None,
+                 query=None, param=CURSOR_PARAM):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.query = query
+        self.param = param
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _url(self, cursor):
+        query = self.query.copy() if self.query is not None else None
+        if query is None:
+            return f'?{self.param}={cursor}' if cursor else '?'
+        query.pop(self.param, None)
+        if cursor:
+            query[self.param] = cursor
+        return f'?{query.urlencode()}'
+
+    @property
+    def first_url(self):
+        return self._url(None)
+
+    @property
+    def next_url(self):
+        return self._url(self.next_cursor)
+
+    @property
+    def previous_url(self):
+        return self._url(self.previous_cursor)
+
+
+class CursorPaginator:
+    """Пагинация по ключу сортировки вместо LIMIT/OFFSET.
+
+    Курсор — непрозрачный токен со значениями полей ``ordering`` крайней
+    записи страницы, поэтому любая страница стоит столько же, сколько первая.
+    """
+
+    def __init__(self, queryset, per_page, ordering=POSTS_ORDERING):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def encode(self, obj, direction):
+        return encode_cursor(
+            direction, [getattr(obj, field) for field in self.fields]
+        )
+
+    def decode(self, token):
+        cursor = decode_cursor(token, len(self.fields))
+        if cursor is None:
+            return None
+        direction, values = cursor
+        opts = self.queryset.model._meta
+        try:
+            values = [
+                opts.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (ValidationError, FieldDoesNotExist):
+            return None
+        return direction, values
+
+    def _seek(self, values, backward):
+        """Условие «строго после values» в порядке сортировки."""
+        condition = None
+        for name, value in reversed(list(zip(self.ordering, values))):
+            field = name.lstrip('-')
+            descending = name.startswith('-') != backward
+            step = Q(**{f'{field}__{"lt" if descending else "gt"}': value})
+            if condition is not None:
+                step |= Q(**{field: value}) & condition
+            condition = step
+        # Избыточная граница по первому полю превращает OR в range scan.
+        first = self.ordering[0]
+        descending = first.startswith('-') != backward
+        bound = Q(**{
+            f'{self.fields[0]}__{"lte" if descending else "gte"}': values[0]
+        })
+        return bound & condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def page_query(self, cursor=None):
+        """Запрос страницы: per_page + 1 строк после курсора."""
+        queryset = self.queryset
+        backward = cursor is not None and cursor[0] == BACKWARD
+        if cursor is not None:
+            queryset = queryset.filter(self._seek(cursor[1], backward))
+        ordering = self._reversed_ordering() if backward else self.ordering
+        return queryset.order_by(*ordering)[:self.per_page + 1]
+
+    def get_rows(self, token=None):
+        """Строки страницы и курсоры соседних страниц."""
+        cursor = self.decode(token) if token else None
+        backward = cursor is not None and cursor[0] == BACKWARD
+        rows = list(self.page_query(cursor))
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backward:
+            if not rows:
+                return self.get_rows()
+            rows.reverse()
+        has_next = True if backward else has_more
+        has_previous = has_more if backward else cursor is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode(rows[-1], FORWARD)
+        if rows and has_previous:
+            previous_cursor = self.encode(rows[0], BACKWARD)
+        return rows, next_cursor, previous_cursor
+
+    def get_page(self, token=None, query=None, param=CURSOR_PARAM):
+        rows, next_cursor, previous_cursor = self.get_rows(token)
+        return CursorPage(rows, next_cursor, previous_cursor, query, param)
+
+
+def paginator_fun(queryset, request, ordering=POSTS_ORDERING,
+                  param=CURSOR_PARAM, per_page=VIEW_COEFF):
+    result = CursorPaginator(queryset, per_page, ordering)
+    page_obj = result.get_page(request.GET.get(param), request.GET, param)
     return page_obj
+
+
+def comments_page(post, request):
+    """Страница комментариев поста от старых к новым вместе с авторами."""
+    comments = post.comments.select_related('author').only(
+        'post_id', 'text', 'created', 'author__username',
+    )
+    result = CursorPaginator(comments, COMMENTS_PER_PAGE, COMMENTS_ORDERING)
+    return result.get_page(
+        request.GET.get(COMMENTS_PARAM), request.GET, COMMENTS_PARAM
+    )
+
+
+def groups_page(request):
+    """Страница каталога групп по алфавиту вместе с их сводками."""
+    groups = Group.objects.select_related('stats').only(
+        'title', 'slug', 'description', 'stats__posts_count',
+        'stats__last_post_at', 'stats__top_authors',
+    )
+    return paginator_fun(
+        groups, request, GROUPS_ORDERING, per_page=GROUPS_PER_PAGE
+    )
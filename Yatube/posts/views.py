@@ -1,62 +1,103 @@
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.template.loader import render_to_string
+from Yatube.settings import VIEW_COEFF
 
+from core.jobs import enqueue
+from core.routers import only_replicas, use_primary
+from core.sqlite import serialized_write
+
+from . import cache, export, pages, syndication
+from .feed import follow_namespaces
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
-from .utils import paginator_fun
+from .search import get_backend
+from .utils import CURSOR_PARAM, CursorPage, comments_page
+
+
+def render_page(request, page, **kwargs):
+    """Собирает контекст страницы из pages и отдаёт её шаблон.
+
+    Объект страницы с ETag читается из основной базы: по нему считаются
+    версии. Остальные запросы идут на реплики, где уже есть записи,
+    сбросившие эти версии.
+    """
+    if not page.validators:
+        return _render_page(request, page, page.load(request, **kwargs))
+    with use_primary():
+        context = page.load(request, **kwargs)
+    versions = cache.get_versions(page.validators(context))
+    not_modified, etag, last_modified = cache.check_not_modified(
+        request, versions
+    )
+    if not_modified is not None:
+        return not_modified
+    with only_replicas(cache.fresh_replicas(versions)):
+        response = _render_page(request, page, context)
+    return cache.set_validators(response, etag, last_modified)
+
+
+def _render_page(request, page, context):
+    queries = page.queries(request, context)
+    context.update({name: query() for name, query in queries.items()})
+    return render(request, page.template, page.finish(context))
 
 
-@cache_page(60 * 20, cache='default', key_prefix='index_page')
+@cache.cache_page_versioned(pages.index.namespaces)
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = paginator_fun(post_list, request)
-    context = {
-        'page_obj': page_obj,
-    }
-    return render(request, 'posts/index.html', context)
+    return render_page(request, pages.index)
+
+
+@cache.cache_page_versioned(pages.popular_posts.namespaces)
+def popular_posts(request):
+    return render_page(request, pages.popular_posts)
+
+
+@cache.cache_page_versioned(pages.group_index.namespaces)
+def group_index(request):
+    return render_page(request, pages.group_index)
 
 
+@cache.cache_page_versioned(pages.group_posts.namespaces)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = paginator_fun(posts, request)
-    context = {'group': group,
-               'page_obj': page_obj,
-               }
-    return render(request, 'posts/group_list.html', context)
+    return render_page(request, pages.group_posts, slug=slug)
 
 
+@cache.cache_page_versioned(pages.profile.namespaces)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    user = request.user
-    posts = author.posts.all()
-    posts_count = posts.count()
-    page_obj = paginator_fun(posts, request)
-    following = False
-    if user.is_authenticated:
-        following = Follow.objects.filter(user=user, author=author).exists()
-    context = {
-        'author': author,
-        'page_obj': page_obj,
-        'posts_count': posts_count,
-        'following': following,
-    }
-    return render(request, 'posts/profile.html', context)
+    return render_page(request, pages.profile, username=username)
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    posts_count = post.author.posts.count()
-    comments = post.comments.all()
-    form = CommentForm()
-    context = {
-        'post': post,
-        'posts_count': posts_count,
-        'comments': comments,
-        'comments_form': form,
-    }
-    return render(request, 'posts/post_detail.html', context)
+    return render_page(request, pages.post_detail, post_id=post_id)
+
+
+def wants_json(request):
+    return request.headers.get('Accept', '').startswith('application/json')
+
+
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом HTML в JSON."""
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    versions = cache.get_versions([cache.post_namespace(post.pk)])
+    not_modified, etag, last_modified = cache.check_not_modified(
+        request, versions
+    )
+    if not_modified is not None:
+        return not_modified
+    with only_replicas(cache.fresh_replicas(versions)):
+        comments = comments_page(post, request)
+        data = {
+            'html': render_to_string(
+                'includes/comments_list.html', {'comments': comments},
+                request,
+            ),
+            'next': request.path + comments.next_url
+            if comments.has_next() else None,
+        }
+    return cache.set_validators(JsonResponse(data), etag, last_modified)
 
 
 @login_required
@@ -67,7 +108,15 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        serialized_write(comment.save)
+        if wants_json(request):
+            html = render_to_string(
+                'includes/comments_list.html', {'comments': [comment]},
+                request,
+            )
+            return JsonResponse({'html': html}, status=201)
+    elif wants_json(request):
+        return JsonResponse({'errors': form.errors}, status=400)
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -78,7 +127,10 @@ def post_create(request):
         return render(request, 'posts/create_post.html', {'form': form})
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    serialized_write(post.save)
+    if post.image:
+        enqueue('posts.render_image', key=f'render_image:{post.pk}',
+                post_id=post.pk)
     return redirect('posts:profile', post.author.username)
 
 
@@ -93,7 +145,10 @@ def post_edit(request, post_id):
         files=request.FILES or None,
     )
     if form.is_valid():
-        form.save()
+        post = serialized_write(form.save)
+        if 'image' in form.changed_data:
+            enqueue('posts.render_image', key=f'render_image:{post.pk}',
+                    post_id=post.pk)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -104,13 +159,73 @@ def post_edit(request, post_id):
 
 
 @login_required
+@cache.cache_page_versioned(pages.follow_index.namespaces)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator_fun(posts, request)
+    return render_page(request, pages.follow_index)
+
+
+@cache.cache_page_versioned(
+    lambda request, fmt: [cache.INDEX], per_user=False
+)
+def index_feed(request, fmt):
+    return syndication.PostsFeed(fmt)(request)
+
+
+@cache.cache_page_versioned(
+    lambda request, slug, fmt: [cache.group_namespace(slug)], per_user=False
+)
+def group_feed(request, slug, fmt):
+    return syndication.GroupFeed(fmt)(request, slug)
+
+
+@cache.cache_page_versioned(
+    lambda request, username, fmt: [cache.profile_namespace(username)],
+    per_user=False,
+)
+def profile_feed(request, username, fmt):
+    return syndication.ProfileFeed(fmt)(request, username)
+
+
+@cache.cache_page_versioned(
+    lambda request, token, fmt: follow_namespaces(
+        User(pk=syndication.follow_user_id(token))
+    ),
+    per_user=False,
+)
+def follow_feed(request, token, fmt):
+    return syndication.FollowFeed(fmt)(request, token)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    group_slug = request.GET.get('group', '')
+    username = request.GET.get('author', '')
+    filters = {}
+    if group_slug:
+        filters['group_id'] = Group.objects.filter(
+            slug=group_slug).values_list('pk', flat=True).first() or 0
+    if username:
+        filters['author_id'] = User.objects.filter(
+            username=username).values_list('pk', flat=True).first() or 0
+    post_ids, next_cursor, previous_cursor = [], None, None
+    if query:
+        post_ids, next_cursor, previous_cursor = get_backend().search(
+            query, VIEW_COEFF, request.GET.get(CURSOR_PARAM), **filters
+        )
+    posts = Post.objects.for_listing().order_by().in_bulk(post_ids)
+    page_obj = CursorPage(
+        [posts[pk] for pk in post_ids if pk in posts],
+        next_cursor,
+        previous_cursor,
+        request.GET,
+    )
     context = {
+        'query': query,
+        'group_slug': group_slug,
+        'username': username,
         'page_obj': page_obj,
     }
-    return render(request, 'posts/follow.html', context)
+    return render(request, 'posts/search.html', context)
 
 
 @login_required
@@ -128,3 +243,44 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=user, author=author).delete()
     return redirect('posts:profile', username)
+
+
+def export_response(posts, name, request):
+    """Потоковая выгрузка постов; формат берётся из ?format=.
+
+    Под ASGI в Django 4.0 синхронный генератор читается в цикле событий,
+    где ORM недоступен, поэтому адреса выгрузки подключаются в urls.py
+    только без ASYNC_VIEWS и обслуживаются WSGI-воркерами.
+    """
+    file_format = request.GET.get('format', 'jsonl')
+    if file_format not in export.FORMATS:
+        file_format = 'jsonl'
+    content_type, extension = export.FORMATS[file_format]
+    response = StreamingHttpResponse(
+        export.export_chunks(posts, file_format),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}.{extension}"'
+    )
+    return response
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    return export_response(
+        Post.objects.filter(author=author), author.username, request
+    )
+
+
+@login_required
+def group_export(request, slug):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(
+        Post.objects.filter(group=group), group.slug, request
+    )